@@ -0,0 +1,370 @@
+import os
+import json
+import wave
+import threading
+import numpy as np
+
+# Audio sources for the tuner. Every source hands out 16-bit mono samples
+# through read(n), returning the raw bytes just like pyaudio's stream.read,
+# so the live stream, a WAV file and a synthetic tone are interchangeable.
+# A short (or empty) read means the source has run out.
+
+def find_input(audio, name, directory=None):
+    """
+    Return the index of the first input device whose name contains name,
+    e.g. ``'USB'``, given a ``pyaudio.PyAudio``. Device indices change
+    when devices come and go, so the answer is cached in the cache
+    directory (see :func:`notes.cache_dir`) and checked against the device
+    it names, and only when that fails are the devices searched again.
+    """
+    from notes import cache_dir
+    path = os.path.join(directory or cache_dir(), 'inputs.json')
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    def matches(index):
+        try:
+            info = audio.get_device_info_by_index(index)
+        except (IOError, ValueError):
+            return False
+        return name in info['name'] and info['maxInputChannels'] > 0
+    index = cached.get(name)
+    if index is not None and matches(index):
+        return index
+    for index in range(audio.get_device_count()):
+        if matches(index):
+            break
+    else:
+        raise ValueError('no input device named %s' % name)
+    cached[name] = index
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(cached, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return index
+
+class PyAudioSource(object):
+    """
+    Reads 16-bit mono samples from a live PyAudio input stream.
+
+    :param dev_index:
+        Input device index found by p.get_device_info_by_index(ii), or part
+        of the device's name, see :func:`find_input`.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param int frames_per_buffer:
+        Size of the PyAudio buffer, normally the hop size.
+
+    :param callback:
+        If given, the stream runs in callback mode and calls this with the
+        bytes of every buffer from PyAudio's own thread; :meth:`read` can't
+        be used then.
+    """
+    def __init__(self, dev_index=2, samp_rate=44100, frames_per_buffer=2048, callback=None):
+        import pyaudio
+        self.samp_rate = samp_rate
+        self._audio = pyaudio.PyAudio()
+        if isinstance(dev_index, str):
+            dev_index = find_input(self._audio, dev_index)
+        stream_callback = None
+        if callback is not None:
+            def stream_callback(in_data, frame_count, time_info, status):
+                callback(in_data)
+                return (None, pyaudio.paContinue)
+        self._stream = self._audio.open(format=pyaudio.paInt16, rate=samp_rate,
+                                        channels=1, input_device_index=dev_index,
+                                        input=True, frames_per_buffer=frames_per_buffer,
+                                        stream_callback=stream_callback)
+        self._stream.start_stream()
+
+    def read(self, n):
+        # an overflow only means we fell behind, keep going with what we have
+        return self._stream.read(n, exception_on_overflow=False)
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._audio.terminate()
+
+
+class WavSource(object):
+    """
+    Reads 16-bit samples from a WAV file. Multi-channel files are reduced
+    to their first channel.
+
+    :param str path:
+        Path to the WAV file.
+    """
+    def __init__(self, path):
+        self._wav = wave.open(path, 'rb')
+        if self._wav.getsampwidth() != 2:
+            raise ValueError('only 16-bit WAV files are supported')
+        self.samp_rate = self._wav.getframerate()
+        self._chans = self._wav.getnchannels()
+
+    def read(self, n):
+        data = self._wav.readframes(n)
+        if self._chans > 1:
+            data = np.frombuffer(data, dtype=np.int16)[::self._chans].tobytes()
+        return data
+
+    def close(self):
+        self._wav.close()
+
+
+class SineSource(object):
+    """
+    Generates a phase continuous tone, optionally with harmonics, so the
+    tuner can run without a sound card.
+
+    :param float freq:
+        Fundamental frequency in Hz.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param float amplitude:
+        Peak amplitude as a fraction of full scale.
+
+    :param tuple harmonics:
+        Relative amplitudes of the fundamental and each overtone, e.g.
+        ``(1, 0.5, 0.25)``. Defaults to a pure tone.
+
+    :param float duration:
+        Seconds of audio to generate, or ``None`` to run forever.
+    """
+    def __init__(self, freq, samp_rate=44100, amplitude=0.5, harmonics=(1.0,), duration=None):
+        self.samp_rate = samp_rate
+        self.freq = freq
+        gains = np.asarray(harmonics, dtype=float)
+        self._gains = amplitude*gains/np.sum(np.abs(gains))
+        self._mults = np.arange(1, len(gains)+1)
+        self._pos = 0
+        self._end = None if duration is None else int(duration*samp_rate)
+
+    def read(self, n):
+        if self._end is not None:
+            n = max(0, min(n, self._end-self._pos))
+        t = (self._pos+np.arange(n))/self.samp_rate
+        tone = np.sin(2*np.pi*self.freq*np.outer(t, self._mults)) @ self._gains
+        self._pos += n
+        return (tone*32767).astype(np.int16).tobytes()
+
+    def close(self):
+        pass
+
+
+class ClickSource(object):
+    """
+    Generates a click track, short decaying bursts of noise on every beat,
+    for testing beat tracking without a sound card.
+
+    :param float bpm:
+        Tempo in beats per minute.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param float amplitude:
+        Peak amplitude of a click as a fraction of full scale.
+
+    :param float duration:
+        Seconds of audio to generate, or ``None`` to run forever.
+    """
+    def __init__(self, bpm, samp_rate=44100, amplitude=0.5, duration=None, seed=0):
+        self.samp_rate = samp_rate
+        self.bpm = bpm
+        self._period = 60.0*samp_rate/bpm
+        length = int(0.03*samp_rate)
+        rng = np.random.default_rng(seed)
+        self._click = amplitude*32767*rng.uniform(-1, 1, length)*np.exp(-np.arange(length)/(0.005*samp_rate))
+        self._pos = 0
+        self._end = None if duration is None else int(duration*samp_rate)
+
+    def read(self, n):
+        if self._end is not None:
+            n = max(0, min(n, self._end-self._pos))
+        out = np.zeros(n)
+        # clicks that overlap this block, including one that began before it
+        first = int(np.floor((self._pos-len(self._click))/self._period))+1
+        beat = max(first, 0)
+        while beat*self._period < self._pos+n:
+            start = int(round(beat*self._period))-self._pos
+            lo = max(start, 0)
+            hi = min(start+len(self._click), n)
+            if hi > lo:
+                out[lo:hi] += self._click[lo-start:hi-start]
+            beat += 1
+        self._pos += n
+        return np.clip(out, -32768, 32767).astype(np.int16).tobytes()
+
+    def close(self):
+        pass
+
+
+class MixSource(object):
+    """
+    Sums several sources sample by sample, e.g. a chord of
+    :class:`SineSource` tones. Runs out when the first of them does.
+
+    :param sources:
+        The sources to mix, all at the same sampling rate.
+    """
+    def __init__(self, *sources):
+        self.samp_rate = sources[0].samp_rate
+        self._sources = sources
+
+    def read(self, n):
+        blocks = [np.frombuffer(s.read(n), dtype=np.int16) for s in self._sources]
+        n = min(len(b) for b in blocks)
+        mix = np.sum([b[:n] for b in blocks], axis=0, dtype=np.int32)
+        return np.clip(mix, -32768, 32767).astype(np.int16).tobytes()
+
+    def close(self):
+        for s in self._sources:
+            s.close()
+
+
+class RingBuffer(object):
+    """
+    Fixed size circular buffer of samples. Writing never allocates and
+    always keeps the most recent samples.
+
+    :param int size:
+        Number of samples held.
+    """
+    def __init__(self, size, dtype=np.int16):
+        self._buf = np.zeros(size, dtype=dtype)
+        self._pos = 0
+        # total samples ever written
+        self.count = 0
+
+    def __len__(self):
+        return len(self._buf)
+
+    def write(self, samples):
+        size = len(self._buf)
+        n = len(samples)
+        if n >= size:
+            self._buf[:] = samples[n-size:]
+            self._pos = 0
+        else:
+            end = self._pos+n
+            if end <= size:
+                self._buf[self._pos:end] = samples
+            else:
+                first = size-self._pos
+                self._buf[self._pos:] = samples[:first]
+                self._buf[:n-first] = samples[first:]
+            self._pos = end % size
+        self.count += n
+
+    def latest(self, out):
+        """
+        Copy the most recent len(out) samples, oldest first, into out.
+        """
+        size = len(self._buf)
+        n = len(out)
+        if n > size:
+            raise ValueError('cannot read more samples than the buffer holds')
+        start = (self._pos-n) % size
+        if start+n <= size:
+            out[:] = self._buf[start:start+n]
+        else:
+            first = size-start
+            out[:first] = self._buf[start:]
+            out[first:] = self._buf[:n-first]
+        return out
+
+
+class FrameRing(object):
+    """
+    Queue of fixed size blocks of samples between exactly one producer
+    thread and one consumer thread. The blocks are preallocated and the
+    read and write counters are each only changed by one side, so pushing
+    never waits on the consumer. When the consumer falls so far behind that
+    the ring is full, the block is dropped and counted in
+    :attr:`overflows`.
+
+    :param int slots:
+        Number of blocks the ring holds.
+
+    :param int size:
+        Samples per block.
+    """
+    def __init__(self, slots, size, dtype=np.int16):
+        self._buf = np.zeros((slots, size), dtype=dtype)
+        self._stamps = np.zeros(slots, dtype=np.int64)
+        self.slots = slots
+        # stamp of the block last taken by get()
+        self.stamp = 0
+        self._write = 0
+        self._read = 0
+        self._ready = threading.Event()
+        self.overflows = 0
+        # most blocks ever waiting at once
+        self.high_water = 0
+
+    def __len__(self):
+        return self._write-self._read
+
+    def push(self, data, stamp=0):
+        """
+        Add a block (bytes or an array of size samples) and an optional
+        integer stamp, e.g. its capture time. Returns ``False`` if the ring
+        was full and the block was dropped.
+        """
+        waiting = self._write-self._read
+        if waiting >= self.slots:
+            self.overflows += 1
+            return False
+        self._buf[self._write % self.slots] = np.frombuffer(data, dtype=self._buf.dtype)
+        self._stamps[self._write % self.slots] = stamp
+        self._write += 1
+        if waiting+1 > self.high_water:
+            self.high_water = waiting+1
+        self._ready.set()
+        return True
+
+    def get(self, out, timeout=None):
+        """
+        Copy the oldest block into out and remove it, waiting up to timeout
+        seconds for one to arrive. Its stamp is left in :attr:`stamp`.
+        Returns ``False`` on timeout.
+        """
+        if self._write == self._read:
+            self._ready.clear()
+            # a push may have landed between the check and the clear
+            if self._write == self._read and not self._ready.wait(timeout):
+                return False
+        out[:] = self._buf[self._read % self.slots]
+        self.stamp = int(self._stamps[self._read % self.slots])
+        self._read += 1
+        return True
+
+
+def hops(source, window=8192, hop=2048):
+    """
+    Generator yielding overlapping windows of int16 samples from source.
+    A new window is produced every hop samples once the first window has
+    filled. The same array is reused for every window, so copy it if you
+    need to keep it.
+    """
+    ring = RingBuffer(window)
+    frame = np.zeros(window, dtype=np.int16)
+    while True:
+        data = source.read(hop)
+        samples = np.frombuffer(data, dtype=np.int16)
+        if len(samples) < hop:
+            return
+        ring.write(samples)
+        if ring.count >= window:
+            yield ring.latest(frame)
@@ -0,0 +1,50 @@
+"""
+Helpers shared by the benchmarks. Importing this puts the repository on
+sys.path so the benchmarks run from anywhere with plain Python.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def mock_pins():
+    """
+    Switch to the simulated hardware backend, with mock pins that record
+    their writes.
+    """
+    import hardware
+    hardware.use('sim')
+
+def summary(ns, scale=1e3, unit='us'):
+    """
+    Mean, median, p95, p99 and worst of an array of nanosecond timings,
+    in microseconds by default.
+    """
+    ns = np.asarray(ns, dtype=float)/scale
+    p50, p95, p99 = np.percentile(ns, (50, 95, 99))
+    return {
+        'n': int(len(ns)),
+        'mean_'+unit: float(np.mean(ns)),
+        'p50_'+unit: float(p50),
+        'p95_'+unit: float(p95),
+        'p99_'+unit: float(p99),
+        'max_'+unit: float(np.max(ns)),
+    }
+
+def time_calls(fn, args, repeats):
+    """
+    Call fn once per entry of args, repeats times over, and return the
+    :func:`summary` of the individual calls.
+    """
+    clock = time.perf_counter_ns
+    out = np.empty(repeats*len(args), dtype=np.int64)
+    i = 0
+    for _ in range(repeats):
+        for a in args:
+            start = clock()
+            fn(a)
+            out[i] = clock()-start
+            i += 1
+    return summary(out)
@@ -0,0 +1,97 @@
+"""
+Cost of the tuner's analysis: one window through a detector and the note
+match, as real_time.py does every hop, across window sizes; and the
+throughput of offline.py on synthetic WAV files. Run with
+``python benchmarks/bench_analysis.py``.
+"""
+import os
+import json
+import time
+import wave
+import shutil
+import tempfile
+import numpy as np
+
+import _util
+from audio_source import SineSource
+from detectors import DETECTORS, make_detector
+from notes import NoteTable
+from offline import analyse_file, analyse_archive
+
+samp_rate = 44100
+chunks = (1024, 2048, 4096, 8192, 16384)
+harmonics = (1.0, 0.6, 0.4, 0.3, 0.2)
+
+def tones(chunk, count=16):
+    freqs = np.geomspace(110, 880, count)
+    return [np.frombuffer(SineSource(f, samp_rate, 0.5, harmonics).read(chunk), dtype=np.int16)
+            for f in freqs]
+
+def per_frame(repeats=20, detectors=None):
+    """
+    Microseconds per window for detector plus note match, for every
+    detector and window size.
+    """
+    table = NoteTable()
+    results = {}
+    for name in sorted(DETECTORS) if detectors is None else detectors:
+        results[name] = {}
+        for chunk in chunks:
+            detector = make_detector(name, chunk, samp_rate)
+            def step(frame):
+                table.nearest(detector.frequency(frame))
+            result = _util.time_calls(step, tones(chunk), repeats)
+            # real_time.py analyses every quarter window
+            result['hop_budget_us'] = 1e6*chunk/4/samp_rate
+            results[name][str(chunk)] = result
+    return results
+
+def write_wav(path, seconds, seed):
+    # a scale of harmonic notes with a little noise
+    rng = np.random.default_rng(seed)
+    notes = 440*np.power(2.0, rng.integers(-12, 13, int(seconds*2))/12.0)
+    samples = np.concatenate([np.frombuffer(SineSource(f, samp_rate, 0.4, harmonics).read(samp_rate//2),
+                                            dtype=np.int16) for f in notes])
+    samples = np.clip(samples+rng.normal(0, 100, len(samples)), -32768, 32767).astype(np.int16)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(samp_rate)
+        f.writeframes(samples.tobytes())
+
+def batch(files=4, seconds=30.0, detectors=('fft', 'yin'), workers=None):
+    """
+    Seconds of audio analysed per second by offline.py, in this process
+    and across a process pool.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(directory, '%d.wav' % i) for i in range(files)]
+        for i, path in enumerate(paths):
+            write_wav(path, seconds, i)
+        results = {}
+        for name in detectors:
+            start = time.perf_counter()
+            audio = sum(analyse_file(path, name)[0] for path in paths)
+            single = time.perf_counter()-start
+            start = time.perf_counter()
+            for _ in analyse_archive(paths, workers, name):
+                pass
+            pooled = time.perf_counter()-start
+            results[name] = {
+                'audio_s': audio,
+                'single_process_x_realtime': audio/single,
+                'pool_x_realtime': audio/pooled,
+            }
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+def run(quick=False):
+    return {
+        'per_frame': per_frame(5 if quick else 20),
+        'batch': batch(2 if quick else 4, 10.0 if quick else 30.0),
+    }
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,65 @@
+"""
+Per-frame cost and accuracy of the pitch detectors on synthetic tones
+whose second harmonic is louder than the fundamental, as with many real
+instruments. Run with ``python benchmarks/bench_detectors.py``.
+"""
+import time
+import numpy as np
+
+import _util
+from audio_source import SineSource
+from detectors import DETECTORS, make_detector
+
+samp_rate = 44100
+chunk = 4096
+# fundamental quieter than the octave above it
+harmonics = (0.4, 1.0, 0.7, 0.5, 0.3, 0.2)
+fundamentals = np.geomspace(110, 880, 25)
+repeats = 20
+
+def frames():
+    out = []
+    for f in fundamentals:
+        tone = SineSource(f, samp_rate, amplitude=0.5, harmonics=harmonics)
+        noise = np.random.default_rng(int(f)).normal(0, 200, chunk)
+        samples = np.frombuffer(tone.read(chunk), dtype=np.int16)+noise
+        out.append((f, np.clip(samples, -32768, 32767).astype(np.int16)))
+    return out
+
+def bench(name, cases):
+    detector = make_detector(name, chunk, samp_rate)
+    cents = []
+    for f, frame in cases:
+        found = detector.frequency(frame)
+        cents.append(np.inf if found is None else abs(1200*np.log2(found/f)))
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for f, frame in cases:
+            detector.frequency(frame)
+    per_frame = (time.perf_counter()-start)/(repeats*len(cases))
+    cents = np.array(cents)
+    return per_frame, np.mean(cents < 50), np.median(cents)
+
+def run(quick=False):
+    global repeats
+    if quick:
+        repeats = 5
+    cases = frames()
+    results = {}
+    for name in sorted(DETECTORS):
+        per_frame, correct, median = bench(name, cases)
+        results[name] = {
+            'per_frame_us': 1e6*per_frame,
+            'correct': float(correct),
+            'median_cents': float(median),
+        }
+    return results
+
+if __name__ == "__main__":
+    cases = frames()
+    print('%d sample window at %d Hz, hop budget %.1f ms for a %d sample hop'
+          % (chunk, samp_rate, 1000.0*chunk/4/samp_rate, chunk//4))
+    print('%-6s %12s %12s %14s' % ('name', 'ms/frame', 'correct', 'median cents'))
+    for name in sorted(DETECTORS):
+        per_frame, correct, median = bench(name, cases)
+        print('%-6s %12.3f %11.0f%% %14.2f' % (name, 1000*per_frame, 100*correct, median))
@@ -0,0 +1,32 @@
+"""
+Cost of writing characters to a :class:`SevenSegmentDisplay` on gpiozero's
+mock pins: repeating the character already shown (nothing to write), and
+changing character on one display and on both of the tuner's displays.
+Run with ``python benchmarks/bench_display.py``.
+"""
+import json
+
+import _util
+from sevensegment import SevenSegmentDisplay, display_many
+
+chars = "0123456789ABCDEF"
+notes = ("A ", "B-", "B ", "C ", "C=", "D ", "D=", "E ", "F ", "F=", "G ", "A-")
+
+def run(quick=False):
+    _util.mock_pins()
+    repeats = 20 if quick else 200
+    top = SevenSegmentDisplay(5, 6, 13, 19, 26, 12, 20)
+    bot = SevenSegmentDisplay(4, 17, 27, 22, 18, 23, 24)
+    try:
+        top.display("8")
+        return {
+            'same_char': _util.time_calls(top.display, ["8"]*len(chars), repeats),
+            'new_char': _util.time_calls(top.display, chars, repeats),
+            'note_pair': _util.time_calls(lambda note: display_many((top, bot), note), notes, repeats),
+        }
+    finally:
+        top.close()
+        bot.close()
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,54 @@
+"""
+Timing error of many simulated conductor arms and tuners sharing one
+event loop and one clock (orchestra.py). For each mix of devices reports
+every device's error from deadline to write, the worst device, and the
+skew between arms that should move in lockstep. Run with
+``python benchmarks/bench_orchestra.py``.
+"""
+import json
+import numpy as np
+
+import _util
+import hardware
+from audio_source import SineSource
+from orchestra import Orchestra, Arm, Tuner
+
+mixes = ((4, 0), (16, 0), (48, 0), (16, 4), (48, 8))
+
+def bench(arms, tuners, seconds, bpm=120):
+    orchestra = Orchestra()
+    for i in range(arms):
+        orchestra.add(Arm('arm%d' % i, hardware.virtual_servos('arm%d' % i), '4/4', bpm))
+    for i in range(tuners):
+        display = hardware.VirtualOutput('tuner%d' % i)
+        def show(note, display=display):
+            display.value = note
+        orchestra.add(Tuner('tuner%d' % i, SineSource(220*2**(i/12.0), harmonics=(1, 0.5, 0.3)), show))
+    orchestra.run(seconds)
+    hardware.pin_log.clear()
+
+    devices = orchestra.report()
+    arm_logs = [d.log.records() for d in orchestra.devices if isinstance(d, Arm)]
+    n = min(len(r) for r in arm_logs)
+    # when each arm finished each keyframe, arms in columns
+    written = np.stack([r[:n, 2] for r in arm_logs], axis=1)
+    skew = (written.max(axis=1)-written.min(axis=1))/1e6
+    worst = max(devices.values(), key=lambda r: r.get('max_ms', 0.0))
+    return {
+        'arms': arms,
+        'tuners': tuners,
+        'worst_arm_max_ms': max(devices['arm%d' % i]['max_ms'] for i in range(arms)),
+        'worst_arm_p99_ms': max(devices['arm%d' % i]['p99_ms'] for i in range(arms)),
+        'worst_device_max_ms': worst['max_ms'],
+        'lockstep_skew_max_ms': float(skew.max()),
+        'lockstep_skew_mean_ms': float(skew.mean()),
+        'devices': devices,
+    }
+
+def run(quick=False):
+    _util.mock_pins()
+    seconds = 2.0 if quick else 6.0
+    return dict(('%d arms, %d tuners' % mix, bench(mix[0], mix[1], seconds)) for mix in mixes)
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
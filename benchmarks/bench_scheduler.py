@@ -0,0 +1,36 @@
+"""
+Timing of the conductor's servo writes against their beats for every time
+signature conductorUK.py offers, on gpiozero's mock pins. Lateness is how
+long after its deadline each keyframe was written; drift is the trend of
+the lateness over the run, which absolute deadlines should keep at zero.
+Run with ``python benchmarks/bench_scheduler.py``.
+"""
+import json
+import numpy as np
+
+import _util
+import hardware
+from gestures import GESTURES, conduct
+
+def bench(time_sig, bars=4, interval=0.1):
+    arms = hardware.servos()
+    try:
+        gesture = GESTURES[time_sig]
+        scheduler = conduct(gesture, bars*gesture.beats, interval, arms)
+        positions = gesture.timeline(bars*gesture.beats)[0]
+    finally:
+        for arm in arms:
+            arm.close()
+    late = np.asarray(scheduler.lateness, dtype=float)
+    result = _util.summary(late)
+    # slope of the lateness against the beat each keyframe was due on
+    result['drift_us_per_beat'] = float(np.polyfit(positions, late, 1)[0]/1e3)
+    result['interval_s'] = interval
+    return result
+
+def run(quick=False):
+    _util.mock_pins()
+    return {time_sig: bench(time_sig, 2 if quick else 4) for time_sig in GESTURES}
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
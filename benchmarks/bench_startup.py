@@ -0,0 +1,63 @@
+"""
+Time from starting the tuner to its first reading, as on every gig. Each
+run is a fresh ``real_time.py --mock --startup`` process on simulated
+pins and microphone, timed through imports, opening the microphone,
+building the note table, setting up the displays and the first reading,
+as marked by :mod:`startup`, plus the time from launching the process to
+the report arriving. The first run is reported on its own, as it may
+also pay for compiling bytecode and reading files the OS hasn't cached.
+Run with ``python benchmarks/bench_startup.py``.
+"""
+import os
+import re
+import sys
+import json
+import time
+import subprocess
+import numpy as np
+
+import _util
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'real_time.py')
+line = re.compile(r'^(.+?)\s+([\d.]+) ms  \(\+([\d.]+) ms\)$')
+
+def launch(env):
+    # returns {step: ms from process start} and the launch to report time
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, script, '--mock', '--startup'], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    steps = {}
+    try:
+        for text in proc.stdout:
+            found = line.match(text.rstrip('\n'))
+            if found:
+                steps[found.group(1)] = float(found.group(2))
+                if found.group(1) == 'first reading':
+                    break
+        wall = 1000*(time.perf_counter()-start)
+    finally:
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+    return steps, wall
+
+def run(quick=False):
+    repeats = 3 if quick else 10
+    env = dict(os.environ, ICONDUCTOR_BACKEND='sim')
+    runs = [launch(env) for _ in range(repeats+1)]
+    first, wall = runs[0]
+    later = {}
+    for steps, _ in runs[1:]:
+        for step, ms in steps.items():
+            later.setdefault(step, []).append(ms)
+    walls = np.array([w for _, w in runs[1:]])
+    return {
+        'first_ms': dict(first, launch_to_report=wall),
+        'median_ms': dict(((step, float(np.median(ms))) for step, ms in later.items()),
+                          launch_to_report=float(np.median(walls))),
+        'max_ms': dict(((step, float(np.max(ms))) for step, ms in later.items()),
+                       launch_to_report=float(np.max(walls))),
+    }
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
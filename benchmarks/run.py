@@ -0,0 +1,81 @@
+"""
+Runs every benchmark and writes the results as one JSON document, with
+enough about the machine to compare runs across releases and Pis. Needs
+no hardware: the GPIO benchmarks use gpiozero's mock pins.
+
+    python benchmarks/run.py --out results.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+
+import _util
+import bench_analysis
+import bench_detectors
+import bench_display
+import bench_orchestra
+import bench_scheduler
+import bench_startup
+
+BENCHMARKS = {
+    'detectors': bench_detectors.run,
+    'analysis': bench_analysis.run,
+    'scheduler': bench_scheduler.run,
+    'display': bench_display.run,
+    'orchestra': bench_orchestra.run,
+    'startup': bench_startup.run,
+}
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def machine():
+    model = None
+    try:
+        # Raspberry Pi OS names the board here
+        with open('/proc/device-tree/model') as f:
+            model = f.read().strip('\x00\n')
+    except OSError:
+        pass
+    return {
+        'revision': revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': platform.node(),
+        'model': model,
+        'machine': platform.machine(),
+        'system': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmarks and emit JSON")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, from %s (default: all)"
+                        % ", ".join(BENCHMARKS))
+    parser.add_argument("--out", help="write the JSON here instead of standard output")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats, for a quick check")
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark - %s' % name)
+
+    results = {'machine': machine()}
+    for name in args.names or list(BENCHMARKS):
+        start = time.perf_counter()
+        results[name] = BENCHMARKS[name](args.quick)
+        print('%s: %.1f s' % (name, time.perf_counter()-start), file=sys.stderr)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text+'\n')
+    else:
+        print(text)
@@ -0,0 +1,197 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from analyzer import FFTAnalyzer
+from notes import NoteTable
+
+# Several notes at once, for chords and ensemble tuning. The spectrum's
+# prominent peaks are found with array operations, every peak is scored as
+# a possible fundamental by summing the peaks sitting on its harmonics, and
+# the best few are taken one at a time, each removing its own harmonics
+# from the peaks before the next is chosen so overtones aren't reported as
+# extra notes.
+
+class MultiPitchDetector(object):
+    """
+    Finds up to max_notes fundamentals in a window of 16-bit samples.
+
+    :param int chunk:
+        Number of samples per analysis window.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param int max_notes:
+        Most notes reported per window.
+
+    :param float fmin:
+        Lowest fundamental reported in Hz.
+
+    :param float fmax:
+        Highest fundamental reported in Hz.
+
+    :param float min_prominence:
+        dB a peak must stand above the lowest point within a few bins on
+        both sides.
+
+    :param int harmonics:
+        Harmonics summed when scoring a fundamental.
+
+    :param float min_salience:
+        A note is only reported if its score is at least this fraction of
+        the strongest note's.
+
+    :param int max_peaks:
+        Only the loudest this many peaks are considered, which bounds the
+        cost per window.
+    """
+    def __init__(self, chunk=4096, samp_rate=44100, max_notes=4, fmin=100, fmax=2000,
+                 min_prominence=20.0, harmonics=6, min_salience=0.2, max_peaks=24, table=None):
+        self.chunk = chunk
+        self.samp_rate = samp_rate
+        self.max_notes = max_notes
+        self.min_prominence = min_prominence
+        self.min_salience = min_salience
+        self.max_peaks = max_peaks
+        self.table = NoteTable() if table is None else table
+        self._analyzer = FFTAnalyzer(chunk, samp_rate, fmin)
+        self._bin_hz = samp_rate/float(chunk)
+        # a Hann window's main lobe is four bins wide, look a little past it
+        self._reach = 6
+        # far enough from DC for the prominence windows either side
+        self._low = max(self._reach+1, int(fmin/self._bin_hz))
+        # peaks up to the highest harmonic of the highest note we report
+        self._high = min(chunk//2-2, int(fmax*harmonics/self._bin_hz))
+        self._fmin = fmin
+        self._fmax = fmax
+        self._harmonics = np.arange(1, harmonics+1, dtype=float)
+        self._weights = 1.0/self._harmonics
+        # a peak belongs to a harmonic if it is within 40 cents of it
+        self._tolerance = 40/1200.0
+
+    def _peaks(self, power):
+        # prominent local maxima of one spectrum, as (freqs, magnitudes)
+        db = 10*np.log10(power[:self._high+self._reach+1]+1e-30)
+        lo = self._low
+        hi = self._high
+        mid = db[lo:hi]
+        local = (mid > db[lo-1:hi-1]) & (mid >= db[lo+1:hi+1])
+        r = self._reach
+        windows = sliding_window_view(db[lo-r:hi+r], r)
+        left = np.min(windows[:hi-lo], axis=1)
+        right = np.min(windows[r+1:r+1+hi-lo], axis=1)
+        prominence = mid-np.maximum(left, right)
+        k = np.flatnonzero(local & (prominence >= self.min_prominence))+lo
+        if len(k) > self.max_peaks:
+            k = k[np.argsort(db[k])[-self.max_peaks:]]
+        # quadratic interpolation of the log magnitude
+        a = db[k-1]
+        b = db[k]
+        c = db[k+1]
+        denom = a-2*b+c
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(denom < 0, np.clip(0.5*(a-c)/denom, -0.5, 0.5), 0.0)
+        return (k+offset)*self._bin_hz, np.sqrt(power[k])
+
+    def _select(self, freqs, mags):
+        # every peak in range is a candidate fundamental, scored by the
+        # weighted magnitudes of the peaks on its harmonics
+        found = np.full(self.max_notes, np.nan)
+        scores = np.zeros(self.max_notes)
+        if len(freqs) == 0:
+            return found, scores
+        candidates = freqs[(freqs >= self._fmin) & (freqs <= self._fmax)]
+        if len(candidates) == 0:
+            return found, scores
+        # (candidate, harmonic, peak) distances in octaves
+        distance = np.abs(np.log2(freqs[None, None, :]/(candidates[:, None, None]*self._harmonics[None, :, None])))
+        on = distance < self._tolerance
+        mags = mags.copy()
+        best = None
+        for n in range(self.max_notes):
+            salience = np.max(on*mags, axis=2) @ self._weights
+            i = int(np.argmax(salience))
+            if salience[i] <= 0:
+                break
+            if best is None:
+                best = salience[i]
+            elif salience[i] < self.min_salience*best:
+                break
+            found[n] = candidates[i]
+            scores[n] = salience[i]
+            # take this note's harmonics out of the running
+            mags[np.any(on[i], axis=0)] = 0.0
+        return found, scores
+
+    def detect(self, data):
+        """
+        Return (freqs, scores, notes, cents) arrays of length max_notes for
+        one window, strongest note first. Unused entries have NaN
+        frequency and cents, zero score and note index -1. Note indices
+        are into the detector's :class:`notes.NoteTable`.
+        """
+        freqs, mags = self._peaks(self._analyzer.spectrum(data))
+        found, scores = self._select(freqs, mags)
+        notes, cents = self.table.lookup(found)
+        return found, scores, notes, cents
+
+    def detect_many(self, frames):
+        """
+        :meth:`detect` for a 2-D array of windows, one per row. The spectra
+        are computed in one batched FFT and the results are (n, max_notes)
+        arrays.
+        """
+        frames = np.asarray(frames)
+        spec = np.fft.rfft(frames*self._analyzer._weights, axis=1)
+        power = spec.real**2+spec.imag**2
+        found = np.full((len(frames), self.max_notes), np.nan)
+        scores = np.zeros((len(frames), self.max_notes))
+        for row in range(len(frames)):
+            found[row], scores[row] = self._select(*self._peaks(power[row]))
+        notes, cents = self.table.lookup(found)
+        return found, scores, notes, cents
+
+    def names(self, notes):
+        """
+        Return the note names (with octave) for an array of note indices,
+        skipping unused entries.
+        """
+        return ['%s%d' % (self.table.names[i], self.table.octaves[i]) for i in np.ravel(notes) if i >= 0]
+
+if __name__ == "__main__":
+    import argparse
+    import hardware
+    from audio_source import WavSource, SineSource, MixSource, hops
+
+    parser = argparse.ArgumentParser(description="Show every note of the chord being played")
+    parser.add_argument("--wav", help="analyse a WAV file instead of the microphone")
+    parser.add_argument("--chord", type=float, nargs='+', help="analyse a synthetic chord of these frequencies")
+    parser.add_argument("--notes", type=int, default=4, help="most notes reported at once")
+    parser.add_argument("--mock", action="store_true", help="simulated microphone, see hardware.py")
+    args = parser.parse_args()
+
+    hardware.use('sim' if args.mock else None)
+
+    chunk = 4096
+    if args.wav:
+        source = WavSource(args.wav)
+    elif args.chord:
+        # one second of the chord, each note with a few overtones
+        source = MixSource(*[SineSource(f, amplitude=0.8/len(args.chord), harmonics=(1, 0.5, 0.3, 0.2),
+                                        duration=1.0) for f in args.chord])
+    else:
+        source = hardware.audio_input(2, 44100, 1024)
+
+    detector = MultiPitchDetector(chunk, source.samp_rate, args.notes)
+    shown = None
+    try:
+        for frame in hops(source, chunk, 1024):
+            freqs, scores, notes, cents = detector.detect(frame)
+            used = notes >= 0
+            names = detector.names(notes[used])
+            if names != shown:
+                shown = names
+                print(' '.join('%s %+.0f' % (n, c) for n, c in zip(names, cents[used])) or '-')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
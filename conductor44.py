@@ -1,39 +1,19 @@
-from gpiozero import Servo
-from time import sleep
-import time
+import hardware
+from gestures import GESTURES, conduct
 
-myGPIO=17
-# Min and Max pulse widths converted into milliseconds
-# To increase range of movement:
-#   increase maxPW from default of 2.0
-#   decrease minPW from default of 1.0
+# Min and Max pulse widths are 1.0 and 2.0 ms widened by myCorrection
+# To increase range of movement increase myCorrection
 # Change myCorrection using increments of 0.05 and
 # check the value works with your servo.
 myCorrection=0.45
-maxPW=(2.0+myCorrection)/1000
-minPW=(1.0-myCorrection)/1000
 
-# motor connected to left of robot moves arm up and down
-myServo=Servo(27,min_pulse_width=minPW,max_pulse_width=maxPW)
-# motor connected to right of robot moves arm forward
-myServo1=Servo(22,min_pulse_width=minPW,max_pulse_width=maxPW)
-# motor connected to base of robot moves arm left and right
-myServo2=Servo(17,min_pulse_width=minPW,max_pulse_width=maxPW)
+if __name__ == "__main__":
+    # real pins unless $ICONDUCTOR_BACKEND=sim, see hardware.py
+    hardware.use()
 
-while True:
-    #4/4 pattern
-    sleep(1)
-    myServo.value=0
-    myServo1.value=0
-    myServo2.value=0
-    sleep(1)
-    myServo.value=0.5
-    myServo1.value=-0.5
-    sleep(1)
-    myServo.value=-0.025
-    myServo1.value=0.025
-    myServo2.value=0.5
-    sleep(1)
-    myServo.value=0.5
-    myServo1.value=-0.5
-    myServo2.value=0
+    # motors connected to the left (arm up and down), right (arm forward)
+    # and base (arm left and right) of the robot
+    myServo,myServo1,myServo2=hardware.servos((27,22,17),myCorrection)
+
+    # 4/4 pattern, one beat a second, forever
+    conduct(GESTURES['4/4'],None,1,(myServo,myServo1,myServo2))
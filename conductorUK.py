@@ -1,122 +1,41 @@
-from gpiozero import Servo
-from time import sleep
-import time
+import hardware
+from gestures import GESTURES, conduct
+from latency import servo_log, format_report
+from score import Score
 
-def threeFour(num_clicks,tempo_int,myServo,myServo1,myServo2):
-    count=0
-
-    while count!=num_clicks:
-        #3/4 pattern
-        sleep(tempo_int)
-        myServo.value=0
-        myServo1.value=0
-        myServo2.value=0
-        sleep(tempo_int)
-        myServo.value=0.5   
-        myServo1.value=-0.5
-        myServo2.value=0
-        count+=1
-        sleep(tempo_int)
-        myServo2.value=0.5
-        #myServo.value=0
-        #myServo1.value=0
-        count+=1
-        sleep(tempo_int)
-        myServo.value=0 
-        myServo1.value=0
-        myServo2.value=0
-        count+=1
-        sleep(tempo_int)
-
-    return True
-
-def twoFour(num_clicks,tempo_int,myServo,myServo1,myServo2):
-    count=0 
-
-    while count!=num_clicks:
-        #2/4 pattern
-        sleep(tempo_int)
-        myServo.value=0
-        myServo1.value=0
-        myServo2.value=0
-        sleep(tempo_int)
-        myServo.value=0.5
-        myServo1.value=-0.5
-        count+=1
-        sleep(tempo_int)
-        myServo.value=-0.025
-        myServo1.value=0.025
-        myServo2.value=0.5
-        sleep(tempo_int)
-        myServo.value=0.5
-        myServo1.value=-0.5
-        myServo2.value=0
-        count+=1
-        sleep(tempo_int)
-        myServo.value=0
-        myServo1.value=0
-        myServo2.value=0
-        sleep(tempo_int)
-
-    return True
-
-def fourFour(num_clicks,tempo_int,myServo,myServo1,myServo2):
-    count=0
-
-    while count!=num_clicks:
-        #4/4 pattern
-        sleep(tempo_int)
-        myServo.value=0
-        myServo1.value=0
-        myServo2.value=0
-        sleep(tempo_int)
-        myServo.value=0.5
-        myServo1.value=-0.5
-        sleep(tempo_int)
-        myServo.value=-0.025
-        myServo1.value=0.025
-        myServo2.value=0.5
-        sleep(tempo_int)
-        myServo.value=0.5
-        myServo1.value=-0.5
-        myServo2.value=0
-        sleep(tempo_int)
-        myServo.value=0
-        myServo1.value=0
-        myServo2.value=0
-        sleep(tempo_int)
-
-    return True
-
-myGPIO=17
-# Min and Max pulse widths converted into milliseconds
-# To increase range of movement:
-#   increase maxPW from default of 2.0
-#   decrease minPW from default of 1.0
+# Min and Max pulse widths are 1.0 and 2.0 ms widened by myCorrection
+# To increase range of movement increase myCorrection
 # Change myCorrection using increments of 0.05 and
 # check the value works with your servo.
 myCorrection=0.45
-maxPW=(2.0+myCorrection)/1000
-minPW=(1.0-myCorrection)/1000
 
-# motor connected to left of robot moves arm up and down
-myServo=Servo(27,min_pulse_width=minPW,max_pulse_width=maxPW)
-# motor connected to right of robot moves arm forward
-myServo1=Servo(22,min_pulse_width=minPW,max_pulse_width=maxPW)
-# motor connected to base of robot moves arm left and right
-myServo2=Servo(17,min_pulse_width=minPW,max_pulse_width=maxPW)
+if __name__ == "__main__":
+    # real pins unless $ICONDUCTOR_BACKEND=sim, see hardware.py
+    hardware.use()
+
+    # motors connected to the left (arm up and down), right (arm forward)
+    # and base (arm left and right) of the robot
+    myServo,myServo1,myServo2=hardware.servos((27,22,17),myCorrection)
 
-time_sig=input("Pick a time signature of 2/4, 3/4, or 4/4 (enter as 3/4 for example): ")
+    time_sig=input("Pick a time signature of %s (enter as 3/4 for example) or a MIDI file to follow: " % ", ".join(GESTURES))
 
-tempo=input("Enter tempo in BPM: ")
+    if time_sig.lower().endswith((".mid",".midi")):
+        # the meter and tempo changes of a piece
+        score=Score.load(time_sig)
+        for number,seconds,name,bpm in score.bars:
+            print("bar %d: %s at %.0f BPM" % (number,name,bpm))
+        log=servo_log()
+        scheduler=score.play((myServo,myServo1,myServo2),log=log)
+        print('Beat lateness: mean %(mean_ms).2f ms, max %(max_ms).2f ms over %(beats)d keyframes' % scheduler.report())
+        print(format_report('servo',log))
+    elif time_sig in GESTURES:
+        tempo=input("Enter tempo in BPM: ")
 
-click_interval=60/int(tempo)
+        click_interval=60/int(tempo)
 
-beats=int(input("Pick how many beats you want (enter 18 if you wants 18 beats total for example): "))
+        beats=int(input("Pick how many beats you want (enter 18 if you wants 18 beats total for example): "))
 
-if time_sig=="2/4":
-    twoFour(beats,click_interval,myServo,myServo1,myServo2)
-elif time_sig=="3/4":
-    threeFour(beats,click_interval,myServo,myServo1,myServo2)
-elif time_sig=="4/4":
-    fourFour(beats,click_interval,myServo,myServo1,myServo2)
+        log=servo_log()
+        scheduler=conduct(GESTURES[time_sig],beats,click_interval,(myServo,myServo1,myServo2),log=log)
+        print('Beat lateness: mean %(mean_ms).2f ms, max %(max_ms).2f ms over %(beats)d keyframes' % scheduler.report())
+        print(format_report('servo',log))
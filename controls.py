@@ -0,0 +1,262 @@
+import time
+import threading
+from collections import deque
+from gestures import GESTURES, REST
+from scheduler import BeatScheduler
+
+# Buttons instead of input() prompts. The conductor keeps running in a
+# thread of its own and the buttons' callbacks reconfigure it in place:
+# start/stop, step through the time signatures and tap the tempo. A new
+# tempo applies from the next keyframe, a new time signature from the next
+# bar, so the arm never jumps mid-pattern.
+
+class TapTempo(object):
+    """
+    Turns button taps into a tempo by averaging the intervals between the
+    most recent taps.
+
+    :param int taps:
+        Most intervals averaged.
+
+    :param float min_interval:
+        Taps closer together than this many seconds are contact bounce and
+        ignored, 0.2 is 300 BPM.
+
+    :param float max_interval:
+        A longer gap than this starts a new run of taps, 2.0 is 30 BPM.
+    """
+    def __init__(self, taps=4, min_interval=0.2, max_interval=2.0):
+        self.min_ns = int(min_interval*1e9)
+        self.max_ns = int(max_interval*1e9)
+        self._intervals = deque(maxlen=taps)
+        self._last = None
+
+    def tap(self, now_ns):
+        """
+        Record a tap at clock time now_ns. Returns the tempo in BPM, or None
+        until there have been two taps in a run.
+        """
+        if self._last is not None:
+            gap = now_ns-self._last
+            if gap < self.min_ns:
+                return None
+            if gap > self.max_ns:
+                self._intervals.clear()
+            else:
+                self._intervals.append(gap)
+        self._last = now_ns
+        if not self._intervals:
+            return None
+        return 60e9*len(self._intervals)/sum(self._intervals)
+
+
+class LiveConductor(object):
+    """
+    Conducts in a background thread until stopped, following changes of
+    tempo and time signature as they are made.
+
+    :param tuple servos:
+        The three :class:`Servo` objects, in pattern order.
+
+    :param str meter:
+        Time signature to start with, one of :data:`gestures.GESTURES`.
+
+    :param float bpm:
+        Tempo to start with.
+
+    :param log:
+        Optional :class:`latency.LatencyLog` as for
+        :func:`gestures.conduct`.
+    """
+    def __init__(self, servos, meter='4/4', bpm=60.0, spin=0.002, log=None, clock=time.perf_counter_ns):
+        if meter not in GESTURES:
+            raise ValueError('unknown time signature - %s' % meter)
+        self.servos = servos
+        self.meter = meter
+        self.bpm = bpm
+        self.log = log
+        self.scheduler = BeatScheduler(60.0/bpm, spin=spin, clock=clock)
+        self._clock = clock
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_tempo(self, bpm):
+        """
+        Change the tempo from the next keyframe on.
+        """
+        self.bpm = bpm
+        self.scheduler.set_interval(60.0/bpm)
+        # the keyframe being waited for has moved
+        self._wake.set()
+
+    def set_meter(self, meter):
+        """
+        Change the time signature from the next bar on.
+        """
+        if meter not in GESTURES:
+            raise ValueError('unknown time signature - %s' % meter)
+        self.meter = meter
+
+    def start(self):
+        """
+        Start conducting, with the first downbeat one beat from now.
+        """
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop conducting and return the arm to rest.
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def _wait(self, position):
+        # like BeatScheduler.wait_for, but the sleep is cut short when the
+        # tempo changes or we are stopped. Returns None if stopped.
+        sched = self.scheduler
+        while True:
+            self._wake.clear()
+            if self._stopping:
+                return None
+            due = sched.deadline(position)
+            remaining = due-self._clock()-sched.spin_ns
+            if remaining <= 0 or not self._wake.wait(remaining/1e9):
+                break
+        sched.position = position
+        late = sched.sleep_until(due)
+        sched.lateness.append(late)
+        return due, late
+
+    def _run(self):
+        sched = self.scheduler
+        sched.start()
+        servos = self.servos
+        bar = 1
+        while True:
+            # the time signature is only read at the start of each bar
+            gesture = GESTURES[self.meter]
+            writes = gesture.writes
+            for k, offset in enumerate(gesture.offsets.tolist()):
+                waited = self._wait(bar+offset)
+                if waited is None:
+                    for servo, value in zip(servos, REST):
+                        servo.value = value
+                    return
+                for j, value in writes[k]:
+                    servos[j].value = value
+                if self.log is not None:
+                    due, late = waited
+                    self.log.record(due, due+late, self.log.now())
+            bar += gesture.beats
+
+
+class Controls(object):
+    """
+    gpiozero buttons driving a :class:`LiveConductor`. Any button can be
+    left out by passing ``None`` for its pin.
+
+    :param LiveConductor conductor:
+        The conductor to control.
+
+    :param start_pin:
+        Button starting and stopping the conductor.
+
+    :param meter_pin:
+        Button stepping through meters, from the next bar.
+
+    :param tap_pin:
+        Button to tap the tempo on, see :class:`TapTempo`.
+
+    :param float bounce_time:
+        Seconds gpiozero ignores a button for after it changes state.
+
+    :param on_change:
+        Optional function called with a message whenever a button changes
+        something.
+    """
+    def __init__(self, conductor, start_pin=25, meter_pin=8, tap_pin=7, meters=None,
+                 bounce_time=0.02, tap=None, on_change=None):
+        from gpiozero import Button
+        self.conductor = conductor
+        self.meters = list(GESTURES) if meters is None else list(meters)
+        self.tap_tempo = TapTempo() if tap is None else tap
+        self.on_change = on_change
+        self.buttons = []
+        for pin, action in ((start_pin, self._start), (meter_pin, self._meter), (tap_pin, self._tap)):
+            if pin is None:
+                continue
+            button = Button(pin, bounce_time=bounce_time)
+            button.when_pressed = action
+            self.buttons.append(button)
+
+    def _changed(self, message):
+        if self.on_change is not None:
+            self.on_change(message)
+
+    def _start(self):
+        self.conductor.toggle()
+        self._changed('conducting' if self.conductor.running else 'stopped')
+
+    def _meter(self):
+        meters = self.meters
+        current = self.conductor.meter
+        meter = meters[(meters.index(current)+1) % len(meters)] if current in meters else meters[0]
+        self.conductor.set_meter(meter)
+        self._changed('time signature %s' % meter)
+
+    def _tap(self):
+        # timestamped first, before anything else can delay it
+        bpm = self.tap_tempo.tap(time.perf_counter_ns())
+        if bpm is not None:
+            self.conductor.set_tempo(bpm)
+            self._changed('tempo %.1f BPM' % bpm)
+
+    def close(self):
+        for button in self.buttons:
+            button.close()
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+    import hardware
+
+    parser = argparse.ArgumentParser(description="Conduct with start/stop, time signature and tap tempo buttons")
+    parser.add_argument("--meter", choices=list(GESTURES), default="4/4")
+    parser.add_argument("--bpm", type=float, default=60)
+    parser.add_argument("--start-pin", type=int, default=25)
+    parser.add_argument("--meter-pin", type=int, default=8)
+    parser.add_argument("--tap-pin", type=int, default=7)
+    parser.add_argument("--mock", action="store_true", help="simulated pins, no Pi needed, see hardware.py")
+    args = parser.parse_args()
+
+    hardware.use('sim' if args.mock else None)
+    conductor = LiveConductor(hardware.servos(), args.meter, args.bpm)
+    controls = Controls(conductor, args.start_pin, args.meter_pin, args.tap_pin, on_change=print)
+    print('press start (GPIO%d), time signature (GPIO%d) or tap the tempo (GPIO%d)'
+          % (args.start_pin, args.meter_pin, args.tap_pin))
+    try:
+        signal.pause()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conductor.stop()
+        controls.close()
@@ -0,0 +1,305 @@
+import numpy as np
+from analyzer import FFTAnalyzer
+
+# Pitch detectors. Every detector takes a window of int16 samples (bytes or
+# an array) through frequency(data) and returns the fundamental in Hz, or
+# None if the window has no clear pitch. frequencies(frames) does the same
+# for a 2-D array of windows at once, with NaN for unpitched windows.
+# After frequency() each detector's confidence attribute scores, from 0 to
+# 1, how clearly pitched the window was.
+# FFTAnalyzer picks the loudest spectral peak, which on real instruments is
+# often a harmonic; the two time domain detectors here look for the period
+# instead.
+
+def _parabola(y, k):
+    # offset of the vertex of the parabola through y[k-1], y[k], y[k+1]
+    if k < 1 or k >= len(y)-1:
+        return 0.0
+    denom = y[k-1]-2*y[k]+y[k+1]
+    if denom == 0:
+        return 0.0
+    return float(min(0.5, max(-0.5, 0.5*(y[k-1]-y[k+1])/denom)))
+
+def _parabolas(y, k):
+    # _parabola for row i of y at column k[i]
+    rows = np.arange(len(k))
+    inner = (k >= 1) & (k < y.shape[1]-1)
+    kk = np.clip(k, 1, y.shape[1]-2)
+    a = y[rows, kk-1]
+    b = y[rows, kk]
+    c = y[rows, kk+1]
+    denom = a-2*b+c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.clip(0.5*(a-c)/denom, -0.5, 0.5)
+    return np.where(inner & (denom != 0), offset, 0.0)
+
+
+class YinDetector(object):
+    """
+    YIN pitch detector (de Cheveigne and Kawahara, 2002). The difference
+    function is computed for all lags at once from an FFT cross-correlation
+    and running energy sums.
+
+    :param int chunk:
+        Number of samples per analysis window. Lags up to half the window
+        are searched.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param float fmin:
+        Lowest fundamental to report in Hz.
+
+    :param float fmax:
+        Highest fundamental to report in Hz.
+
+    :param float threshold:
+        Absolute threshold on the normalised difference function, lower is
+        stricter.
+    """
+    def __init__(self, chunk=4096, samp_rate=44100, fmin=100, fmax=2000, threshold=0.15):
+        self.chunk = chunk
+        self.samp_rate = samp_rate
+        self.threshold = threshold
+        self._w = chunk//2
+        self.tau_min = max(2, int(samp_rate/fmax))
+        self.tau_max = min(self._w-1, int(np.ceil(samp_rate/fmin)))
+        self._tau = np.arange(self.tau_max+1, dtype=float)
+        self._x = np.empty(chunk, dtype=float)
+        self._energy = np.zeros(chunk+1, dtype=float)
+        self._cmnd = np.ones(self.tau_max+1, dtype=float)
+        self.confidence = 0.0
+
+    def frequency(self, data):
+        x = self._x
+        np.copyto(x, np.frombuffer(data, dtype=np.int16), casting='unsafe')
+        w = self._w
+        tau_max = self.tau_max
+
+        # sum over j < w of x[j]*x[j+tau], a circular correlation of length
+        # chunk is enough as negative lags only wrap past w
+        acf = np.fft.irfft(np.conj(np.fft.rfft(x[:w], self.chunk))*np.fft.rfft(x), self.chunk)
+
+        # energy[k] is the sum of x[j]**2 for j < k
+        np.cumsum(x*x, out=self._energy[1:])
+        e = self._energy
+        d = e[w]+e[w:w+tau_max+1]-e[:tau_max+1]-2*acf[:tau_max+1]
+
+        # cumulative mean normalised difference
+        cmnd = self._cmnd
+        running = np.cumsum(d[1:])
+        np.divide(d[1:]*self._tau[1:], running, out=cmnd[1:], where=running > 0)
+        cmnd[1:][running <= 0] = 1.0
+
+        below = np.flatnonzero(cmnd[self.tau_min:] < self.threshold)
+        if len(below) == 0:
+            self.confidence = 0.0
+            return None
+        t = below[0]+self.tau_min
+        # walk down to the bottom of the dip
+        while t < tau_max and cmnd[t+1] < cmnd[t]:
+            t += 1
+        self.confidence = float(max(0.0, 1.0-cmnd[t]))
+        return self.samp_rate/(t+_parabola(cmnd, t))
+
+    def frequencies(self, frames):
+        x = np.asarray(frames, dtype=float)
+        w = self._w
+        tau_max = self.tau_max
+
+        acf = np.fft.irfft(np.conj(np.fft.rfft(x[:, :w], self.chunk, axis=1))*np.fft.rfft(x, axis=1),
+                           self.chunk, axis=1)
+        e = np.zeros((len(x), self.chunk+1))
+        np.cumsum(x*x, axis=1, out=e[:, 1:])
+        d = e[:, w:w+1]+e[:, w:w+tau_max+1]-e[:, :tau_max+1]-2*acf[:, :tau_max+1]
+
+        cmnd = np.ones_like(d)
+        running = np.cumsum(d[:, 1:], axis=1)
+        np.divide(d[:, 1:]*self._tau[1:], running, out=cmnd[:, 1:], where=running > 0)
+
+        search = cmnd[:, self.tau_min:]
+        below = search < self.threshold
+        voiced = np.any(below, axis=1)
+        first = np.argmax(below, axis=1)
+        # the bottom of the dip is the first lag from there that the curve
+        # stops falling, or the last lag searched
+        rising = np.ones(search.shape, dtype=bool)
+        rising[:, :-1] = search[:, 1:] >= search[:, :-1]
+        rising &= np.arange(search.shape[1]) >= first[:, None]
+        t = np.argmax(rising, axis=1)+self.tau_min
+        freqs = self.samp_rate/(t+_parabolas(cmnd, t))
+        freqs[~voiced] = np.nan
+        return freqs
+
+
+class AutocorrDetector(object):
+    """
+    Normalised autocorrelation pitch detector, using the normalised square
+    difference function of McLeod and Wyvill (2005) computed with one FFT
+    pair.
+
+    :param int chunk:
+        Number of samples per analysis window.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param float fmin:
+        Lowest fundamental to report in Hz.
+
+    :param float fmax:
+        Highest fundamental to report in Hz.
+
+    :param float cutoff:
+        A peak is accepted if it is at least this fraction of the highest
+        peak, so the first strong repeat wins over later multiples.
+
+    :param float clarity:
+        Windows whose highest peak is below this are treated as unpitched.
+    """
+    def __init__(self, chunk=4096, samp_rate=44100, fmin=100, fmax=2000, cutoff=0.9, clarity=0.5):
+        self.chunk = chunk
+        self.samp_rate = samp_rate
+        self.cutoff = cutoff
+        self.clarity = clarity
+        self.tau_min = max(2, int(samp_rate/fmax))
+        self.tau_max = min(chunk//2, int(np.ceil(samp_rate/fmin)))
+        self._nfft = 2*chunk
+        # one lag past tau_max, so a peak at tau_max has a neighbour on both
+        # sides and fmin itself is found
+        tau = np.arange(self.tau_max+2)
+        self._head = chunk-tau
+        self._tail = tau
+        self._x = np.empty(chunk, dtype=float)
+        self._energy = np.zeros(chunk+1, dtype=float)
+        self.confidence = 0.0
+
+    def frequency(self, data):
+        x = self._x
+        np.copyto(x, np.frombuffer(data, dtype=np.int16), casting='unsafe')
+        tau_max = self.tau_max
+        self.confidence = 0.0
+
+        spec = np.fft.rfft(x, self._nfft)
+        r = np.fft.irfft(spec.real**2+spec.imag**2, self._nfft)[:tau_max+2]
+
+        # m(tau) is the energy of x[:n-tau] plus the energy of x[tau:]
+        np.cumsum(x*x, out=self._energy[1:])
+        e = self._energy
+        m = e[self._head]+e[-1]-e[self._tail]
+        nsdf = np.divide(2*r, m, out=np.zeros_like(r), where=m > 0)
+
+        s = nsdf[self.tau_min-1:]
+        peaks = np.flatnonzero((s[1:-1] > s[:-2]) & (s[1:-1] >= s[2:]))+self.tau_min
+        if len(peaks) == 0:
+            return None
+        heights = nsdf[peaks]
+        best = np.max(heights)
+        if best < self.clarity:
+            return None
+        t = peaks[np.argmax(heights >= self.cutoff*best)]
+        self.confidence = float(min(1.0, nsdf[t]))
+        return self.samp_rate/(t+_parabola(nsdf, t))
+
+    def frequencies(self, frames):
+        x = np.asarray(frames, dtype=float)
+        tau_max = self.tau_max
+
+        spec = np.fft.rfft(x, self._nfft, axis=1)
+        r = np.fft.irfft(spec.real**2+spec.imag**2, self._nfft, axis=1)[:, :tau_max+2]
+
+        e = np.zeros((len(x), self.chunk+1))
+        np.cumsum(x*x, axis=1, out=e[:, 1:])
+        m = e[:, self._head]+e[:, -1:]-e[:, self._tail]
+        nsdf = np.divide(2*r, m, out=np.zeros_like(r), where=m > 0)
+
+        s = nsdf[:, self.tau_min-1:]
+        peaks = (s[:, 1:-1] > s[:, :-2]) & (s[:, 1:-1] >= s[:, 2:])
+        heights = np.where(peaks, s[:, 1:-1], -np.inf)
+        best = np.max(heights, axis=1)
+        voiced = best >= self.clarity
+        t = np.argmax(heights >= self.cutoff*best[:, None], axis=1)+self.tau_min
+        freqs = self.samp_rate/(t+_parabolas(nsdf, t))
+        freqs[~voiced] = np.nan
+        return freqs
+
+
+class GatedDetector(object):
+    """
+    Puts a noise gate in front of a detector and a confidence check behind
+    it. Windows quieter than the gate are dropped before any FFT is done;
+    windows the detector isn't confident about are reported as unpitched.
+    After each call :attr:`silent` says whether the gate dropped the window.
+
+    :param detector:
+        The detector to wrap.
+
+    :param float gate_dbfs:
+        RMS level, in dB below full scale, under which a window is silence.
+
+    :param float min_confidence:
+        Lowest detector confidence accepted.
+    """
+    def __init__(self, detector, gate_dbfs=-50.0, min_confidence=0.5):
+        self.detector = detector
+        self.chunk = detector.chunk
+        self.samp_rate = detector.samp_rate
+        self.min_confidence = min_confidence
+        # sum of squares of a window at the gate level, in int16 units
+        self._gate = detector.chunk*(32768.0*np.power(10.0, gate_dbfs/20.0))**2
+        self._squares = np.empty(detector.chunk, dtype=float)
+        self.silent = True
+        self.confidence = 0.0
+        self.gated = 0
+        self.rejected = 0
+        self.accepted = 0
+
+    def frequency(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)
+        np.multiply(samples, samples, out=self._squares, dtype=float)
+        if np.sum(self._squares) < self._gate:
+            self.silent = True
+            self.confidence = 0.0
+            self.gated += 1
+            return None
+        self.silent = False
+        freq = self.detector.frequency(data)
+        self.confidence = 0.0 if freq is None else self.detector.confidence
+        if freq is None or self.confidence < self.min_confidence:
+            self.rejected += 1
+            return None
+        self.accepted += 1
+        return freq
+
+    def frequencies(self, frames):
+        # only the gate applies to batches
+        energy = np.einsum('ij,ij->i', frames, frames, dtype=float)
+        loud = energy >= self._gate
+        freqs = np.full(len(frames), np.nan)
+        if np.any(loud):
+            freqs[loud] = self.detector.frequencies(frames[loud])
+        return freqs
+
+
+DETECTORS = {
+    'fft': FFTAnalyzer,
+    'yin': YinDetector,
+    'acf': AutocorrDetector,
+}
+
+def make_detector(name, chunk=4096, samp_rate=44100, mic_low_freq=100, mic_sens_dBV=-47.0,
+                  gate_dbfs=None, min_confidence=0.0):
+    """
+    Build the detector called name ('fft', 'yin' or 'acf') for the given
+    window size and sample rate, wrapped in a :class:`GatedDetector` if
+    gate_dbfs is given.
+    """
+    if name not in DETECTORS:
+        raise ValueError('unknown detector - %s' % name)
+    if name == 'fft':
+        detector = FFTAnalyzer(chunk, samp_rate, mic_low_freq, mic_sens_dBV)
+    else:
+        detector = DETECTORS[name](chunk, samp_rate, fmin=mic_low_freq)
+    if gate_dbfs is not None:
+        detector = GatedDetector(detector, gate_dbfs, min_confidence)
+    return detector
@@ -0,0 +1,151 @@
+import numpy as np
+from scheduler import BeatScheduler
+
+# Conducting patterns as data. Each time signature is the number of beats
+# in a bar and a list of keyframes, (beat offset in the bar, positions of
+# the three servos). The servos are in the order the conductor scripts
+# create them: up and down (GPIO27), forward (GPIO22), left and right at the
+# base (GPIO17). None leaves that servo where it is. Beats are whatever
+# note value the tempo counts, e.g. eighth notes for 6/8 and 12/8.
+#
+# Adding a time signature only needs a new entry here.
+
+REST = (0, 0, 0)
+
+PATTERNS = {
+    '2/4': (2, [
+        (0.0, REST),
+        (0.5, (0.5, -0.5, None)),
+        (1.0, (-0.025, 0.025, 0.5)),
+        (1.5, (0.5, -0.5, 0)),
+    ]),
+    '3/4': (3, [
+        (0, REST),
+        (1, (0.5, -0.5, 0)),
+        (2, (0.5, -0.5, 0.5)),
+    ]),
+    '4/4': (4, [
+        (0, REST),
+        (1, (0.5, -0.5, None)),
+        (2, (-0.025, 0.025, 0.5)),
+        (3, (0.5, -0.5, 0)),
+    ]),
+    '5/4': (5, [
+        (0, REST),
+        (1, (0.5, -0.5, 0)),
+        (2, (-0.025, 0.025, 0.5)),
+        (3, (0.5, -0.5, 0.5)),
+        (4, (0.5, -0.5, 0)),
+    ]),
+    # in two, with the three eighths of each half of the bar subdivided
+    '6/8': (6, [
+        (0, REST),
+        (1, (0.25, -0.25, None)),
+        (2, (0.5, -0.5, None)),
+        (3, (-0.025, 0.025, 0.5)),
+        (4, (0.25, -0.25, None)),
+        (5, (0.5, -0.5, 0)),
+    ]),
+    # the 4/4 pattern with each beat split into three eighths
+    '12/8': (12, [
+        (0, REST),
+        (1, (0.25, -0.25, None)),
+        (2, (0.5, -0.5, None)),
+        (3, (0.5, -0.5, 0.25)),
+        (4, (0.25, -0.25, None)),
+        (5, (-0.025, 0.025, 0.5)),
+        (6, (0.25, -0.25, None)),
+        (7, (0.5, -0.5, None)),
+        (8, (0.5, -0.5, 0.25)),
+        (9, (0.5, -0.5, 0)),
+        (10, (0.25, -0.25, None)),
+        (11, (0.5, -0.5, None)),
+    ]),
+}
+
+class Gesture(object):
+    """
+    A conducting pattern compiled from its keyframe table.
+
+    :param int beats:
+        Beats in one bar.
+
+    :param list keyframes:
+        (beat offset, (servo positions)) pairs in time order, with None for
+        servos that keep their position.
+    """
+    def __init__(self, beats, keyframes):
+        self.beats = beats
+        self.offsets = np.array([offset for offset, _ in keyframes], dtype=float)
+        self.positions = np.array([[np.nan if p is None else p for p in positions]
+                                   for _, positions in keyframes], dtype=float)
+        if np.any(np.diff(self.offsets) <= 0) or self.offsets[-1] >= beats:
+            raise ValueError('keyframes must be in order and inside the bar')
+        # where every servo is at each keyframe, following holds round the bar
+        self.targets = self.positions.copy()
+        for _ in range(2):
+            for k in range(len(self.targets)):
+                held = np.isnan(self.targets[k])
+                self.targets[k, held] = self.targets[k-1, held]
+        self.targets[np.isnan(self.targets)] = 0.0
+        # the servo writes for each keyframe, worked out once
+        self.writes = [tuple((int(j), float(row[j])) for j in np.flatnonzero(~np.isnan(row)))
+                       for row in self.positions]
+
+    def timeline(self, num_beats):
+        """
+        Return (beat positions, keyframe indices) of every keyframe in the
+        first num_beats beats.
+        """
+        bars = -(-num_beats//self.beats)
+        positions = (np.arange(bars)[:, None]*self.beats+self.offsets).ravel()
+        frames = np.tile(np.arange(len(self.offsets)), bars)
+        keep = positions < num_beats
+        return positions[keep], frames[keep]
+
+# every pattern compiled at load
+GESTURES = dict((name, Gesture(beats, keyframes)) for name, (beats, keyframes) in PATTERNS.items())
+
+def conduct(gesture, num_beats, interval, servos, scheduler=None, log=None):
+    """
+    Conduct num_beats beats of gesture (or forever if num_beats is None)
+    at interval seconds per beat. The first keyframe is one interval after
+    the call, as the scripts always started with a sleep. Returns the
+    scheduler so its lateness can be reported.
+
+    :param Gesture gesture:
+        Pattern to conduct, e.g. ``GESTURES['3/4']``.
+
+    :param tuple servos:
+        The three :class:`Servo` objects, in pattern order.
+
+    :param log:
+        Optional :class:`latency.LatencyLog` with fields ``('scheduled',
+        'woke', 'written')``, given a record for every keyframe: when it
+        was due, when the scheduler woke up for it and when its servo
+        writes were done.
+    """
+    if scheduler is None:
+        scheduler = BeatScheduler(interval)
+    scheduler.start()
+    writes = gesture.writes
+
+    def keyframe(position, k):
+        late = scheduler.wait_for(position)
+        for j, value in writes[k]:
+            servos[j].value = value
+        if log is not None:
+            due = scheduler.deadline(position)
+            log.record(due, due+late, log.now())
+
+    if num_beats is not None:
+        positions, frames = gesture.timeline(num_beats)
+        for position, k in zip(positions.tolist(), frames.tolist()):
+            keyframe(1+position, k)
+        return scheduler
+    bar = 0
+    offsets = gesture.offsets.tolist()
+    while True:
+        for k, offset in enumerate(offsets):
+            keyframe(1+bar*gesture.beats+offset, k)
+        bar += 1
@@ -0,0 +1,243 @@
+import os
+import csv
+import time
+import threading
+import numpy as np
+from audio_source import PyAudioSource, WavSource, SineSource
+
+# Where the servos, displays and microphone come from. The real backend is
+# gpiozero's own pins and PyAudio. The simulated backend needs neither a Pi
+# nor a sound card: gpiozero gets mock pins that record every write with
+# its time in pin_log, and the microphone replays a WAV file or a tone at
+# the rate a real one would deliver it.
+#
+# The backend is picked by $ICONDUCTOR_BACKEND ('real' or 'sim', default
+# real), or by the scripts' --mock option. For the simulated microphone,
+# $ICONDUCTOR_AUDIO names a WAV file or a frequency in Hz (default 440).
+# Call use() before creating any device.
+#
+# gpiozero is only imported once a device is wanted, so scripts that never
+# touch a pin (or haven't yet) don't wait for it at startup.
+
+BACKENDS = ('real', 'sim')
+
+class PinLog(object):
+    """
+    Record of every write to a simulated pin, in the order they happened.
+    :attr:`writes` is a list of (clock ns, pin name, value).
+
+    :param clock:
+        Function returning the time in integer nanoseconds, the same clock
+        as :class:`scheduler.BeatScheduler` so writes can be compared with
+        their deadlines.
+    """
+    def __init__(self, clock=time.perf_counter_ns):
+        self._clock = clock
+        self.writes = []
+
+    def __len__(self):
+        return len(self.writes)
+
+    def record(self, pin, value):
+        # a single append, so pins written from several threads are safe
+        self.writes.append((self._clock(), pin, value))
+
+    def clear(self):
+        self.writes = []
+
+    def arrays(self, pin=None):
+        """
+        Return (times, values) arrays of the writes to pin, or of every
+        write if pin is None. Pins are named as gpiozero names them, e.g.
+        ``'GPIO27'``.
+        """
+        rows = [(t, v) for t, p, v in self.writes if pin is None or p == pin]
+        times = np.array([t for t, v in rows], dtype=np.int64)
+        values = np.array([v for t, v in rows], dtype=float)
+        return times, values
+
+    def save(self, path):
+        """
+        Write the log to a CSV file of time (ns), pin and value.
+        """
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time_ns', 'pin', 'value'])
+            writer.writerows(self.writes)
+
+pin_log = PinLog()
+
+_recording_pin = None
+
+def _recording_pin_class():
+    global _recording_pin
+    if _recording_pin is None:
+        from gpiozero.pins.mock import MockPWMPin
+
+        class RecordingPin(MockPWMPin):
+            """
+            gpiozero mock pin (with PWM, for the servos) that records its
+            writes in :data:`pin_log`.
+            """
+            def _set_state(self, value):
+                super(RecordingPin, self)._set_state(value)
+                pin_log.record(self.info.name, float(value))
+
+        _recording_pin = RecordingPin
+    return _recording_pin
+
+def __getattr__(name):
+    # RecordingPin is made on first use, as it needs gpiozero
+    if name == 'RecordingPin':
+        return _recording_pin_class()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+class VirtualOutput(object):
+    """
+    An output that only exists in :data:`pin_log`, for simulating more
+    devices than the board has pins. Anything assigned to :attr:`value`
+    (a servo position, the characters on a display) is recorded under
+    name.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._value = None
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        pin_log.record(self.name, value)
+
+    def close(self):
+        pass
+
+
+class SimulatedInput(object):
+    """
+    Stands in for :class:`audio_source.PyAudioSource`, delivering the
+    samples of another source no faster than real time. Like a stream,
+    :meth:`read` blocks until the samples would have arrived, or in
+    callback mode a thread hands over each buffer as it is due.
+
+    :param source:
+        Source to replay, e.g. a :class:`audio_source.WavSource`.
+
+    :param int frames_per_buffer:
+        Samples per callback.
+
+    :param callback:
+        If given, called with the bytes of every buffer from a thread of
+        its own, as PyAudio's callback mode does.
+    """
+    def __init__(self, source, frames_per_buffer=2048, callback=None):
+        self.samp_rate = source.samp_rate
+        self._source = source
+        self._frames = frames_per_buffer
+        self._start = time.perf_counter()
+        self._pos = 0
+        self._stop = threading.Event()
+        self._thread = None
+        if callback is not None:
+            self._thread = threading.Thread(target=self._run, args=(callback,))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def read(self, n):
+        self._pos += n
+        delay = self._start+self._pos/float(self.samp_rate)-time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return self._source.read(n)
+
+    def _run(self, callback):
+        while not self._stop.is_set():
+            data = self.read(self._frames)
+            if len(data) < 2*self._frames:
+                break
+            callback(data)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._source.close()
+
+
+backend = None
+audio = os.environ.get('ICONDUCTOR_AUDIO')
+
+def use(name=None, sim_audio=None):
+    """
+    Select the backend, 'real' or 'sim', defaulting to
+    $ICONDUCTOR_BACKEND. sim_audio is a WAV path or a frequency for the
+    simulated microphone. Returns the backend's name.
+    """
+    global backend, audio
+    if name is None:
+        name = os.environ.get('ICONDUCTOR_BACKEND', 'real')
+    if name not in BACKENDS:
+        raise ValueError('unknown backend - %s' % name)
+    if name == 'sim':
+        from gpiozero import Device
+        from gpiozero.pins.mock import MockFactory
+        Device.pin_factory = MockFactory(pin_class=_recording_pin_class())
+    elif backend == 'sim':
+        from gpiozero import Device
+        # gpiozero picks its default factory again on the next device
+        Device.pin_factory = None
+    if sim_audio is not None:
+        audio = sim_audio
+    backend = name
+    return name
+
+def simulated():
+    """
+    Return ``True`` if the simulated backend is in use.
+    """
+    if backend is None:
+        use()
+    return backend == 'sim'
+
+def servos(pins=(27, 22, 17), correction=0.45):
+    """
+    Return a :class:`Servo` for each pin, in the conductor's order: the
+    left motor moving the arm up and down, the right one moving it forward
+    and the base moving it left and right.
+
+    The minimum and maximum pulse widths are 1.0 and 2.0 ms widened by
+    correction ms. To increase the range of movement increase correction
+    in steps of 0.05 and check the value works with your servos.
+    """
+    from gpiozero import Servo
+    simulated()
+    maxPW=(2.0+correction)/1000
+    minPW=(1.0-correction)/1000
+    return tuple(Servo(pin, min_pulse_width=minPW, max_pulse_width=maxPW) for pin in pins)
+
+def virtual_servos(name):
+    """
+    Return three :class:`VirtualOutput` servos named name/0, name/1 and
+    name/2, in the conductor's order.
+    """
+    return tuple(VirtualOutput('%s/%d' % (name, j)) for j in range(3))
+
+def audio_input(dev_index=2, samp_rate=44100, frames_per_buffer=2048, callback=None):
+    """
+    Open the microphone, see :class:`audio_source.PyAudioSource`;
+    dev_index may be part of the device's name instead. With the simulated
+    backend this is a :class:`SimulatedInput` replaying :data:`audio`.
+    """
+    if not simulated():
+        return PyAudioSource(dev_index, samp_rate, frames_per_buffer, callback)
+    if audio is None:
+        source = SineSource(440.0, samp_rate)
+    elif audio.lower().endswith('.wav'):
+        source = WavSource(audio)
+    else:
+        source = SineSource(float(audio), samp_rate)
+    return SimulatedInput(source, frames_per_buffer, callback)
@@ -0,0 +1,160 @@
+import json
+import time
+import numpy as np
+
+# Latency instrumentation, cheap enough to leave on. Each instrumented path
+# records one row of monotonic timestamps per event (a hop analysed, a note
+# shown, a servo written) into a preallocated ring, which costs one small
+# array write and keeps the most recent events. Percentiles and histograms
+# are only computed when asked for.
+
+class LatencyLog(object):
+    """
+    Ring of timestamp records, one column per named stage of a path, e.g.
+    ``('capture', 'start', 'end', 'match')``. Records are written by one
+    thread; reading from another may see the row being written half
+    updated, which only matters for the newest record.
+
+    :param tuple fields:
+        Names of the timestamps in each record, in the order they happen.
+
+    :param int size:
+        Records kept; older ones are overwritten.
+
+    :param clock:
+        Function returning the time in integer nanoseconds, for
+        :meth:`now`. The default is the clock the schedulers use.
+    """
+    def __init__(self, fields, size=4096, clock=time.perf_counter_ns):
+        self.fields = tuple(fields)
+        self.now = clock
+        self._buf = np.zeros((size, len(self.fields)), dtype=np.int64)
+        # total records ever written
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, len(self._buf))
+
+    def record(self, *stamps):
+        """
+        Add a record of one timestamp (ns) per field. Returns its number,
+        counting from 0 for the first record ever.
+        """
+        n = self.count
+        self._buf[n % len(self._buf)] = stamps
+        self.count = n+1
+        return n
+
+    def records(self):
+        """
+        Return the records held, oldest first, as an (n, fields) array.
+        """
+        size = len(self._buf)
+        if self.count <= size:
+            return self._buf[:self.count].copy()
+        start = self.count % size
+        return np.concatenate([self._buf[start:], self._buf[:start]])
+
+    def get(self, n):
+        """
+        Return record number n as a dict, or None if it has been
+        overwritten or not written yet.
+        """
+        if not self.count-len(self._buf) <= n < self.count:
+            return None
+        return dict(zip(self.fields, self._buf[n % len(self._buf)].tolist()))
+
+    def stages(self):
+        """
+        Return the (name, first, last) field pairs reported: each step from
+        one field to the next, then first to last overall.
+        """
+        f = self.fields
+        pairs = [('%s_to_%s' % (a, b), a, b) for a, b in zip(f[:-1], f[1:])]
+        if len(f) > 2:
+            pairs.append(('total', f[0], f[-1]))
+        return pairs
+
+    def intervals(self, first, last):
+        """
+        Return the times in milliseconds from field first to field last for
+        every record held.
+        """
+        rows = self.records()
+        return (rows[:, self.fields.index(last)]-rows[:, self.fields.index(first)])/1e6
+
+    def report(self):
+        """
+        Return p50, p95, p99 and worst case in milliseconds for every stage.
+        """
+        out = {}
+        for name, first, last in self.stages():
+            ms = self.intervals(first, last)
+            if len(ms) == 0:
+                out[name] = {'n': 0}
+                continue
+            p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+            out[name] = {
+                'n': int(len(ms)),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(np.max(ms)),
+            }
+        return out
+
+    def histogram(self, first, last, bins=50):
+        """
+        Return (counts, edges in ms) of the times from field first to field
+        last, see :func:`numpy.histogram`.
+        """
+        return np.histogram(self.intervals(first, last), bins)
+
+    def export(self, bins=50):
+        """
+        Return the report with a histogram of every stage, as a dict ready
+        for JSON.
+        """
+        stages = {}
+        summary = self.report()
+        for name, first, last in self.stages():
+            stages[name] = dict(summary[name])
+            if summary[name]['n']:
+                counts, edges = self.histogram(first, last, bins)
+                stages[name]['histogram'] = {'counts': counts.tolist(), 'edges_ms': edges.tolist()}
+        return {'fields': list(self.fields), 'records': self.count, 'stages': stages}
+
+def tuner_logs(size=4096):
+    """
+    Return the logs kept for the tuner: 'analysis', a record for every hop
+    analysed, and 'output', a record for every note shown.
+    """
+    return {
+        'analysis': LatencyLog(('capture', 'start', 'end', 'match'), size),
+        'output': LatencyLog(('capture', 'start', 'end', 'match', 'written'), size),
+    }
+
+def servo_log(size=4096):
+    """
+    Return a log for servo writes, see :func:`gestures.conduct`.
+    """
+    return LatencyLog(('scheduled', 'woke', 'written'), size)
+
+def save(path, logs, bins=50):
+    """
+    Write :meth:`LatencyLog.export` of each of a dict of logs to a JSON
+    file, keyed by name.
+    """
+    with open(path, 'w') as f:
+        json.dump(dict((name, log.export(bins)) for name, log in logs.items()), f, indent=2)
+
+def format_report(name, log):
+    """
+    Return a line per stage of log's report, for printing.
+    """
+    lines = []
+    for stage, r in log.report().items():
+        if r['n']:
+            lines.append('%s %s: p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms (%d)'
+                         % (name, stage, r['p50_ms'], r['p95_ms'], r['p99_ms'], r['max_ms'], r['n']))
+    return '\n'.join(lines)
@@ -0,0 +1,156 @@
+import time
+import numpy as np
+from gestures import GESTURES
+from scheduler import BeatScheduler
+
+# Smooth servo motion. Instead of jumping to each keyframe on its beat, the
+# arm is moved every tick of a fixed rate control loop along an eased path
+# that arrives at each keyframe exactly on its beat. The easing curves are
+# sampled once into arrays and looked up per tick.
+
+EASING_SAMPLES = 1024
+
+_u = np.linspace(0.0, 1.0, EASING_SAMPLES+1)
+
+EASINGS = {
+    # hold, then jump on the beat, as the conductor scripts move
+    'step': np.where(_u < 1.0, 0.0, 1.0),
+    'linear': _u,
+    # smoothstep, zero velocity at both ends
+    'cubic': _u*_u*(3-2*_u),
+    # minimum jerk, zero velocity and acceleration at both ends
+    'minjerk': _u*_u*_u*(10-15*_u+6*_u*_u),
+}
+
+class MotionEngine(object):
+    """
+    Fixed rate control loop moving three servos along eased paths between
+    the keyframes of a :class:`gestures.Gesture`.
+
+    Positions are computed a bar of ticks at a time with NumPy, so the loop
+    itself only waits for each tick and writes three values. Ticks are
+    scheduled against absolute deadlines; a tick that is more than a whole
+    period late is skipped rather than played in a burst.
+
+    :param tuple servos:
+        The three :class:`Servo` objects, in pattern order.
+
+    :param float rate:
+        Control loop rate in Hz.
+
+    :param str easing:
+        One of the curves in :data:`EASINGS`.
+    """
+    def __init__(self, servos, rate=100, easing='minjerk', spin=0.0005,
+                 clock=time.perf_counter_ns, sleep=time.sleep):
+        if easing not in EASINGS:
+            raise ValueError('unknown easing - %s' % easing)
+        self.servos = servos
+        self.rate = rate
+        self.curve = EASINGS[easing]
+        self._clock = clock
+        self._sched = BeatScheduler(1.0/rate, spin=spin, clock=clock, sleep=sleep)
+        self.ticks = 0
+        self.skipped = 0
+        self.max_overrun_ns = 0
+        self.elapsed_ns = 0
+
+    def positions(self, gesture, beats):
+        """
+        Return the servo positions, one row per entry of beats (beat
+        positions from the start of the pattern), as an (n, 3) array.
+        """
+        offsets = gesture.offsets
+        # keyframe times and targets with the first keyframe of the next bar
+        # on the end, so the last segment of a bar leads into the next one
+        times = np.append(offsets, offsets[0]+gesture.beats)
+        targets = np.vstack([gesture.targets, gesture.targets[:1]])
+        t = np.mod(beats-offsets[0], gesture.beats)+offsets[0]
+        k = np.clip(np.searchsorted(times, t, side='right')-1, 0, len(offsets)-1)
+        alpha = (t-times[k])/(times[k+1]-times[k])
+        eased = self.curve[(alpha*EASING_SAMPLES).astype(int)]
+        return targets[k]+(targets[k+1]-targets[k])*eased[:, None]
+
+    def play(self, gesture, num_beats, interval, log=None):
+        """
+        Conduct num_beats beats of gesture (or forever if num_beats is
+        None) at interval seconds per beat, starting one interval from now
+        like :func:`gestures.conduct`. If log (a
+        :class:`latency.LatencyLog` with fields ``('scheduled', 'woke',
+        'written')``) is given every tick written is recorded in it.
+        """
+        ticks_per_beat = self.rate*interval
+        period_ns = 1e9/self.rate
+        if num_beats is None:
+            total = None
+        else:
+            last = gesture.timeline(num_beats)[0][-1]
+            total = int(np.floor(last*ticks_per_beat))+1
+        block = max(1, int(round(ticks_per_beat*gesture.beats)))
+        servo0, servo1, servo2 = self.servos
+
+        start = self._clock()+int(round(interval*1e9))
+        i = 0
+        while total is None or i < total:
+            n = block if total is None else min(block, total-i)
+            rows = self.positions(gesture, np.arange(i, i+n)/ticks_per_beat).tolist()
+            for row in rows:
+                due = start+int(round(i*period_ns))
+                late = self._sched.sleep_until(due)
+                i += 1
+                self.ticks += 1
+                if late > self.max_overrun_ns:
+                    self.max_overrun_ns = late
+                if late > period_ns:
+                    self.skipped += 1
+                    continue
+                servo0.value, servo1.value, servo2.value = row
+                if log is not None:
+                    log.record(due, due+late, log.now())
+            self.elapsed_ns = self._clock()-start
+
+        # finish exactly on the last keyframe
+        k = gesture.timeline(num_beats)[1][-1]
+        servo0.value, servo1.value, servo2.value = gesture.targets[k].tolist()
+
+    def report(self):
+        """
+        Return the achieved loop rate and tick overruns so far.
+        """
+        seconds = self.elapsed_ns/1e9
+        return {
+            'ticks': self.ticks,
+            'rate_hz': self.ticks/seconds if seconds > 0 else 0.0,
+            'max_overrun_ms': self.max_overrun_ns/1e6,
+            'skipped': self.skipped,
+        }
+
+if __name__ == "__main__":
+    import argparse
+    import hardware
+    import latency
+
+    parser = argparse.ArgumentParser(description="Smooth conducting with a fixed rate control loop")
+    parser.add_argument("time_sig", choices=list(GESTURES))
+    parser.add_argument("bpm", type=float)
+    parser.add_argument("beats", type=int)
+    parser.add_argument("--rate", type=float, default=100, help="control loop rate in Hz")
+    parser.add_argument("--easing", choices=sorted(EASINGS), default="minjerk")
+    parser.add_argument("--latency", help="write servo write latency percentiles and histograms to this JSON file")
+    parser.add_argument("--mock", action="store_true",
+                        help="simulated pins and microphone, no Pi needed, see hardware.py")
+    args = parser.parse_args()
+
+    hardware.use('sim' if args.mock else None)
+
+    # motors moving the arm up and down, forward, and left and right
+    myServo,myServo1,myServo2=hardware.servos()
+
+    engine = MotionEngine((myServo,myServo1,myServo2), args.rate, args.easing)
+    log = latency.servo_log()
+    engine.play(GESTURES[args.time_sig], args.beats, 60/args.bpm, log)
+    print('%(ticks)d ticks at %(rate_hz).1f Hz, max overrun %(max_overrun_ms).2f ms, %(skipped)d skipped'
+          % engine.report())
+    print(latency.format_report('servo', log))
+    if args.latency:
+        latency.save(args.latency, {'servo': log})
@@ -0,0 +1,487 @@
+import math
+import time
+import socket
+import struct
+import threading
+from collections import deque
+import numpy as np
+from gestures import GESTURES, REST
+from latency import servo_log
+from scheduler import BeatScheduler
+
+# Several conductors hitting the same beats across a local network. One Pi
+# leads: it conducts on its own clock and sends its beat schedule (when
+# beat 0 was, the interval and the time signature) to every follower. Each
+# follower keeps asking the leader the time, NTP style, filters the answers
+# into an estimate of the leader's clock as an offset and a drift from its
+# own, and conducts the leader's schedule against that estimate.
+#
+# Everything is UDP, one small packet per message:
+#
+#   Q  follower -> leader  seq, t1 (follower clock when sent)
+#   R  leader -> follower  seq, t1, t2, t3 (leader clock on arrival and reply)
+#   S  leader -> follower  epoch, beat 0 time (ns, leader clock), interval
+#                          (ns), beat the time signature started on, meter
+#
+# The leader answers every Q with an R and an S, and also sends an S to
+# every follower it has heard from on every beat, so a follower that lost
+# packets catches up within a beat.
+
+PORT = 5005
+
+_QUERY = struct.Struct('>cIq')
+_REPLY = struct.Struct('>cIqqq')
+_SCHEDULE = struct.Struct('>cIqqd8s')
+
+# a follower the leader hasn't heard from for this long is dropped
+FOLLOWER_TIMEOUT = 10.0
+
+class ClockSync(object):
+    """
+    Estimate of a remote clock from NTP style exchanges. Each exchange
+    gives an offset (remote minus local) and a round trip delay; the half
+    of the recent exchanges with the shortest delays, which queueing least
+    distorted, are fitted with a straight line so the estimate follows
+    the drift between the two clocks as well as their offset.
+
+    :param int window:
+        Exchanges kept.
+
+    :param float max_drift:
+        Largest drift believed, as a fraction (500e-6 is 500 ppm).
+    """
+    def __init__(self, window=32, max_drift=500e-6):
+        self._samples = deque(maxlen=window)
+        self.max_drift = max_drift
+        # (t0, offset at t0, drift) of the latest fit, replaced together so
+        # the conducting thread never mixes two fits
+        self._fit = (0, 0.0, 0.0)
+        self.delay_ns = None
+
+    def __len__(self):
+        return len(self._samples)
+
+    @property
+    def offset_ns(self):
+        return self._fit[1]
+
+    @property
+    def drift(self):
+        return self._fit[2]
+
+    def add(self, t1, t2, t3, t4):
+        """
+        Add one exchange: t1 local send, t2 remote receive, t3 remote
+        reply, t4 local receive, all in nanoseconds.
+        """
+        offset = ((t2-t1)+(t3-t4))/2.0
+        delay = (t4-t1)-(t3-t2)
+        self._samples.append(((t1+t4)//2, offset, delay))
+        samples = np.array(self._samples, dtype=float)
+        times, offsets, delays = samples.T
+        best = delays <= np.median(delays)
+        self.delay_ns = float(np.min(delays))
+        t0 = int(times[-1])
+        span = times[best].max()-times[best].min()
+        if np.count_nonzero(best) >= 4 and span > 2e9:
+            drift, offset = np.polyfit(times[best]-t0, offsets[best], 1)
+            if abs(drift) > self.max_drift:
+                drift = math.copysign(self.max_drift, drift)
+                offset = np.median(offsets[best]-drift*(times[best]-t0))
+        else:
+            drift, offset = 0.0, np.median(offsets[best])
+        self._fit = (t0, float(offset), float(drift))
+
+    def offset_at(self, local_ns):
+        """
+        Return the estimated remote minus local time at local_ns.
+        """
+        t0, offset, drift = self._fit
+        return offset+drift*(local_ns-t0)
+
+    def remote(self, local_ns):
+        """
+        Return the estimated remote clock reading at local_ns.
+        """
+        return local_ns+int(self.offset_at(local_ns))
+
+
+class _Node(object):
+    # the conducting shared by the leader and followers: a schedule of
+    # (beat 0 time, interval, beat the meter started on, meter), all on the
+    # leader's clock, conducted from the next bar line on
+    def __init__(self, servos, clock, spin, log_size):
+        self.servos = servos
+        self.log = servo_log(log_size)
+        # (position, local clock ns) of the most recent servo writes
+        self.written = deque(maxlen=log_size)
+        self._clock = clock
+        self._sleeper = BeatScheduler(1.0, spin=spin, clock=self.now)
+        self._stop = threading.Event()
+        self._threads = []
+        self.schedule = None
+
+    def now(self):
+        # the leader's clock, as best we know it
+        return self._clock()
+
+    def _conduct(self):
+        bar = None
+        servos = self.servos
+        while not self._stop.is_set():
+            start_ns, interval_ns, origin, meter = self.schedule
+            gesture = GESTURES[meter]
+            if bar is None or bar < origin:
+                # the first bar line from now on, counted from origin
+                position = (self.now()-start_ns)/float(interval_ns)
+                bar = origin+max(0, math.ceil((position-origin)/gesture.beats))*gesture.beats
+            for k, offset in enumerate(gesture.offsets.tolist()):
+                # the latest schedule for every keyframe, so tempo changes
+                # apply straight away
+                start_ns, interval_ns = self.schedule[:2]
+                due = start_ns+int(round((bar+offset)*interval_ns))
+                while due-self.now() > 0.05e9 and not self._stop.is_set():
+                    # wait in short steps so a new schedule or stop is seen
+                    self._stop.wait(min(0.05, (due-self.now())/1e9-0.01))
+                    start_ns, interval_ns = self.schedule[:2]
+                    due = start_ns+int(round((bar+offset)*interval_ns))
+                if self._stop.is_set():
+                    break
+                late = self._sleeper.sleep_until(due)
+                for j, value in gesture.writes[k]:
+                    servos[j].value = value
+                self.written.append((bar+offset, self._clock()))
+                self.log.record(due, due+late, self.now())
+            bar += gesture.beats
+        for servo, value in zip(servos, REST):
+            servo.value = value
+
+    def _spawn(self, target):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._sock.close()
+
+
+class Leader(_Node):
+    """
+    Conducts on its own clock and sends its schedule to followers.
+
+    :param tuple servos:
+        The three servos, in pattern order.
+
+    :param str meter:
+        Time signature, one of :data:`gestures.GESTURES`.
+
+    :param float bpm:
+        Tempo in beats per minute.
+
+    :param tuple address:
+        (host, port) to listen on.
+    """
+    def __init__(self, servos, meter='4/4', bpm=60.0, address=('', PORT), lead_in=1.0, spin=0.002,
+                 clock=time.perf_counter_ns, log_size=4096):
+        _Node.__init__(self, servos, clock, spin, log_size)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(address)
+        self._sock.settimeout(0.1)
+        self.followers = {}
+        self.epoch = 0
+        self._lock = threading.Lock()
+        self.schedule = (clock()+int(lead_in*1e9), int(round(60e9/bpm)), 0.0, meter)
+
+    def set_tempo(self, bpm):
+        """
+        Change the tempo from now on, keeping the beat in phase.
+        """
+        start_ns, interval_ns, origin, meter = self.schedule
+        now = self.now()
+        position = (now-start_ns)/float(interval_ns)
+        interval = int(round(60e9/bpm))
+        self._publish((int(now-position*interval), interval, origin, meter))
+
+    def set_meter(self, meter):
+        """
+        Change the time signature from the next bar line of the current
+        one.
+        """
+        start_ns, interval_ns, origin, current = self.schedule
+        beats = GESTURES[current].beats
+        position = (self.now()-start_ns)/float(interval_ns)
+        origin = origin+math.ceil((position-origin)/beats)*beats
+        self._publish((start_ns, interval_ns, origin, meter))
+
+    def _publish(self, schedule):
+        with self._lock:
+            self.epoch += 1
+            self.schedule = schedule
+        self._announce()
+
+    def _packet(self):
+        # the schedule with its own epoch
+        with self._lock:
+            epoch = self.epoch
+            start_ns, interval_ns, origin, meter = self.schedule
+        return _SCHEDULE.pack(b'S', epoch, start_ns, interval_ns, origin, meter.encode())
+
+    def _announce(self):
+        # called from the beat, receive and caller's threads alike
+        packet = self._packet()
+        now = time.monotonic()
+        with self._lock:
+            for address in [a for a, seen in self.followers.items() if now-seen > FOLLOWER_TIMEOUT]:
+                del self.followers[address]
+            addresses = list(self.followers)
+        for address in addresses:
+            self._sock.sendto(packet, address)
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, address = self._sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            t2 = self._clock()
+            if len(data) != _QUERY.size or data[:1] != b'Q':
+                continue
+            _, seq, t1 = _QUERY.unpack(data)
+            self._sock.sendto(_REPLY.pack(b'R', seq, t1, t2, self._clock()), address)
+            self._sock.sendto(self._packet(), address)
+            with self._lock:
+                self.followers[address] = time.monotonic()
+
+    def _beats(self):
+        # announce the schedule once a beat
+        while not self._stop.is_set():
+            start_ns, interval_ns = self.schedule[:2]
+            position = math.floor((self.now()-start_ns)/float(interval_ns))+1
+            self._stop.wait(max(0.0, (start_ns+position*interval_ns-self.now())/1e9))
+            self._announce()
+
+    def start(self):
+        self._spawn(self._serve)
+        self._spawn(self._beats)
+        self._spawn(self._conduct)
+
+
+class Follower(_Node):
+    """
+    Conducts the leader's schedule against an estimate of the leader's
+    clock.
+
+    :param tuple servos:
+        The three servos, in pattern order.
+
+    :param tuple leader:
+        (host, port) of the leader.
+
+    :param float rate:
+        Clock exchanges per second, after a faster burst at the start.
+
+    :param int min_samples:
+        Exchanges before the follower starts conducting.
+    """
+    def __init__(self, servos, leader, rate=2.0, min_samples=8, spin=0.002,
+                 clock=time.perf_counter_ns, log_size=4096):
+        _Node.__init__(self, servos, clock, spin, log_size)
+        self.leader = leader
+        self.sync = ClockSync()
+        self.rate = rate
+        self.min_samples = min_samples
+        self.epoch = -1
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.settimeout(0.1)
+        # seq -> t1 of queries not yet answered, shared by the query and
+        # receive threads
+        self._sent = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def now(self):
+        return self.sync.remote(self._clock())
+
+    def _query(self):
+        seq = 0
+        while not self._stop.is_set():
+            seq += 1
+            t1 = self._clock()
+            with self._lock:
+                self._sent[seq] = t1
+            try:
+                self._sock.sendto(_QUERY.pack(b'Q', seq, t1), self.leader)
+            except OSError:
+                pass
+            # a burst of exchanges to start with, then a steady rate
+            self._stop.wait(0.05 if len(self.sync) < self.min_samples else 1.0/self.rate)
+
+    def _receive(self):
+        while not self._stop.is_set():
+            try:
+                data = self._sock.recv(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            t4 = self._clock()
+            kind = data[:1]
+            if kind == b'R' and len(data) == _REPLY.size:
+                _, seq, t1, t2, t3 = _REPLY.unpack(data)
+                with self._lock:
+                    sent = self._sent.pop(seq, None)
+                    for old in [s for s in self._sent if s < seq-64]:
+                        del self._sent[old]
+                # only answers to our own queries, once each
+                if sent == t1:
+                    self.sync.add(t1, t2, t3, t4)
+            elif kind == b'S' and len(data) == _SCHEDULE.size:
+                _, epoch, start_ns, interval_ns, origin, meter = _SCHEDULE.unpack(data)
+                if epoch >= self.epoch:
+                    self.epoch = epoch
+                    self.schedule = (start_ns, interval_ns, origin, meter.rstrip(b'\0').decode())
+            if self.schedule is not None and len(self.sync) >= self.min_samples:
+                self._ready.set()
+
+    def _follow(self):
+        while not self._stop.is_set():
+            if self._ready.wait(0.1):
+                self._conduct()
+                return
+
+    def start(self):
+        self._spawn(self._receive)
+        self._spawn(self._query)
+        self._spawn(self._follow)
+
+
+def skew(nodes):
+    """
+    Return the spread in milliseconds between the nodes' writes of every
+    keyframe they all played, given each node's (position, true time ns)
+    pairs. True times must be on one clock, e.g. from processes on one
+    host.
+    """
+    common = None
+    times = []
+    for written in nodes:
+        table = dict(written)
+        times.append(table)
+        common = set(table) if common is None else common & set(table)
+    common = sorted(common)
+    if not common:
+        return np.zeros(0)
+    stamps = np.array([[table[p] for p in common] for table in times], dtype=float)
+    return (stamps.max(axis=0)-stamps.min(axis=0))/1e6
+
+def _skewed_clock(offset_ms, drift_ppm):
+    # a clock that is offset and runs fast or slow, to give the sync
+    # something to find when every process is on the same host. Returns
+    # the clock and a function turning its readings back into true time.
+    base = time.perf_counter_ns()
+    rate = 1+drift_ppm*1e-6
+    offset = int(offset_ms*1e6)
+    def clock():
+        return base+int((time.perf_counter_ns()-base)*rate)+offset
+    def true(ns):
+        return base+int((ns-offset-base)/rate)
+    return clock, true
+
+def _run_node(role, port, seconds, bpm, meter, offset_ms, drift_ppm, results):
+    import hardware
+    servos = hardware.virtual_servos('%s' % role)
+    if role == 'leader':
+        node = Leader(servos, meter, bpm, ('127.0.0.1', port))
+        true = int
+    else:
+        clock, true = _skewed_clock(offset_ms, drift_ppm)
+        node = Follower(servos, ('127.0.0.1', port), clock=clock)
+    node.start()
+    time.sleep(seconds)
+    node.stop()
+    written = [(p, true(t)) for p, t in node.written]
+    estimate = None
+    if role != 'leader':
+        # what the follower found, against what it was given
+        now = time.perf_counter_ns()
+        local = node._clock()
+        estimate = {'offset_ms': -node.sync.offset_at(local)/1e6, 'true_offset_ms': (local-now)/1e6,
+                    'drift_ppm': -node.sync.drift*1e6, 'true_drift_ppm': drift_ppm,
+                    'delay_ms': node.sync.delay_ns/1e6}
+    results.put((role, written, node.log.report()['total'], estimate))
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+    import hardware
+
+    parser = argparse.ArgumentParser(description="Conduct in sync with other Pis over the network")
+    sub = parser.add_subparsers(dest="mode")
+    lead = sub.add_parser("leader", help="conduct and send the beat to followers")
+    lead.add_argument("--meter", choices=list(GESTURES), default="4/4")
+    lead.add_argument("--bpm", type=float, default=60)
+    follow = sub.add_parser("follower", help="conduct the leader's beat")
+    follow.add_argument("host", help="the leader's address")
+    for p in (lead, follow):
+        p.add_argument("--port", type=int, default=PORT)
+        p.add_argument("--mock", action="store_true", help="simulated pins, no Pi needed, see hardware.py")
+    test = sub.add_parser("test", help="a leader and followers as processes on this host, reporting beat skew")
+    test.add_argument("--followers", type=int, default=3)
+    test.add_argument("--seconds", type=float, default=15)
+    test.add_argument("--bpm", type=float, default=120)
+    test.add_argument("--meter", choices=list(GESTURES), default="4/4")
+    test.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    if args.mode == "test":
+        import multiprocessing
+        results = multiprocessing.Queue()
+        rng = np.random.default_rng()
+        procs = [multiprocessing.Process(target=_run_node, args=(
+            'leader', args.port, args.seconds+2, args.bpm, args.meter, 0, 0, results))]
+        for i in range(args.followers):
+            # every follower's clock is off by up to 50 ms and 100 ppm
+            procs.append(multiprocessing.Process(target=_run_node, args=(
+                'follower%d' % i, args.port, args.seconds, args.bpm, args.meter,
+                rng.uniform(-50, 50), rng.uniform(-100, 100), results)))
+        for p in procs:
+            p.start()
+            time.sleep(0.2)
+        nodes = dict((role, rest) for role, *rest in (results.get() for _ in procs))
+        for p in procs:
+            p.join()
+        for role, (written, total, estimate) in sorted(nodes.items()):
+            line = '%-10s %3d writes, late p50 %.3f ms, p99 %.3f ms' % (
+                role, len(written), total.get('p50_ms', 0), total.get('p99_ms', 0))
+            if estimate is not None:
+                line += (', offset %(offset_ms)+.3f ms (%(true_offset_ms)+.3f), drift %(drift_ppm)+.1f ppm'
+                         ' (%(true_drift_ppm)+.1f), min delay %(delay_ms).3f ms' % estimate)
+            print(line)
+        spread = skew([written for written, _, _ in nodes.values()])
+        if len(spread):
+            print('skew over %d keyframes: p50 %.3f ms, p95 %.3f ms, max %.3f ms'
+                  % (len(spread), np.percentile(spread, 50), np.percentile(spread, 95), spread.max()))
+        else:
+            print('no keyframe was played by every node')
+    elif args.mode in ("leader", "follower"):
+        hardware.use('sim' if args.mock else None)
+        if args.mode == "leader":
+            node = Leader(hardware.servos(), args.meter, args.bpm, ('', args.port))
+        else:
+            node = Follower(hardware.servos(), (args.host, args.port))
+        node.start()
+        try:
+            signal.pause()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            node.stop()
+            print('late p50 %(p50_ms).3f ms, p99 %(p99_ms).3f ms, max %(max_ms).3f ms' % node.log.report()['total'])
+    else:
+        parser.print_help()
@@ -0,0 +1,154 @@
+import os
+import math
+import numpy as np
+
+# note names in the same spelling as the displays use them, '#' shows as
+# '=' and 'b' as '-' on the bottom digit
+NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "Ab", "A", "Bb", "B")
+
+def _fifths(fifth, lowest):
+    # a chain of twelve fifths of the given size in cents, starting lowest
+    # fifths below C, folded into one octave
+    cents = [0.0]*12
+    for k in range(lowest, lowest+12):
+        cents[(7*k) % 12] = (k*fifth) % 1200
+    return tuple(cents)
+
+def _ratios(*ratios):
+    return tuple(1200*math.log2(r) for r in ratios)
+
+# cents above the root for each of the twelve notes of the octave, from the
+# root up; a table is transposed so the root can be any note
+TEMPERAMENTS = {
+    'equal': tuple(100.0*i for i in range(12)),
+    # pure fifths from Ab to C#
+    'pythagorean': _fifths(1200*math.log2(1.5), -4),
+    # fifths narrowed by a quarter of a syntonic comma, pure major thirds
+    'meantone': _fifths(1200*math.log2(1.5)-1200*math.log2(81/80.0)/4, -3),
+    # five limit just intonation
+    'just': _ratios(1, 16/15.0, 9/8.0, 6/5.0, 5/4.0, 4/3.0, 45/32.0, 3/2.0, 8/5.0, 5/3.0, 9/5.0, 15/8.0),
+    'werckmeister': (0.0, 90.225, 192.18, 294.135, 390.225, 498.045, 588.27, 696.09, 792.18, 888.27,
+                     996.09, 1092.18),
+    'vallotti': (0.0, 94.135, 196.09, 298.045, 392.18, 501.955, 592.18, 698.045, 796.09, 894.135,
+                 1000.0, 1090.225),
+}
+
+class NoteTable(object):
+    """
+    Sorted table of note frequencies used to find the nearest note to a
+    frequency with a binary search.
+
+    The boundaries between neighbouring notes (their geometric means) are
+    precomputed, so :meth:`nearest` is one :func:`numpy.searchsorted` call
+    and a log for the cents offset.
+
+    :param float a4:
+        Frequency of A4 in Hz, e.g. 442 or 443 for orchestras tuning high
+        or 415 for baroque pitch.
+
+    :param int low_octave:
+        Octave of the lowest C in the table.
+
+    :param int high_octave:
+        Octave of the highest B in the table.
+
+    :param str temperament:
+        One of :data:`TEMPERAMENTS`. A4 is always exactly a4, the other
+        notes sit where the temperament puts them relative to it.
+
+    :param str root:
+        Note the temperament is built on, one of :data:`NOTE_NAMES`.
+    """
+    def __init__(self, a4=440.0, low_octave=0, high_octave=8, temperament='equal', root='C'):
+        if temperament not in TEMPERAMENTS:
+            raise ValueError('unknown temperament - %s' % temperament)
+        if root not in NOTE_NAMES:
+            raise ValueError('unknown root - %s' % root)
+        self.a4 = a4
+        self.temperament = temperament
+        self.root = root
+        # MIDI note numbers, A4 is 69
+        midi = np.arange(12*(low_octave+1), 12*(high_octave+2))
+        # each note's offset from equal temperament, relative to A's
+        r = NOTE_NAMES.index(root)
+        steps = (np.arange(12)-r) % 12
+        offset = np.asarray(TEMPERAMENTS[temperament])[steps]-100*steps
+        offset -= offset[9]
+        self._build(midi, a4*np.power(2.0, (midi-69+offset[midi % 12]/100)/12.0))
+
+    def _build(self, midi, freqs):
+        self.midi = midi
+        self.freqs = freqs
+        self.names = [NOTE_NAMES[m % 12] for m in midi]
+        self.octaves = [int(m)//12-1 for m in midi]
+        self.edges = np.sqrt(self.freqs[:-1]*self.freqs[1:])
+        # half a semitone past either end of the table
+        self._low = self.freqs[0]/2**(1/24.0)
+        self._high = self.freqs[-1]*2**(1/24.0)
+
+    def __len__(self):
+        return len(self.freqs)
+
+    def index(self, freq):
+        """
+        Return the table index of the note nearest to freq, or None if freq
+        is more than half a semitone outside the table.
+        """
+        if freq is None or not freq > 0:
+            return None
+        i = int(np.searchsorted(self.edges, freq))
+        if i == 0 and freq < self._low:
+            return None
+        if i == len(self.freqs)-1 and freq > self._high:
+            return None
+        return i
+
+    def nearest(self, freq):
+        """
+        Return (name, octave, cents) for the note nearest to freq, where
+        cents is how far freq is above (positive) or below the note. Returns
+        None for frequencies outside the table.
+        """
+        i = self.index(freq)
+        if i is None:
+            return None
+        return self.names[i], self.octaves[i], 1200*math.log2(freq/self.freqs[i])
+
+    def lookup(self, freqs):
+        """
+        Vectorised :meth:`nearest` for an array of frequencies. Returns
+        (indices, cents) arrays, with index -1 and NaN cents where there is
+        no pitch or it is outside the table.
+        """
+        freqs = np.asarray(freqs, dtype=float)
+        idx = np.searchsorted(self.edges, freqs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cents = 1200*np.log2(freqs/self.freqs[idx])
+        # unequal temperaments have steps wider than 100 cents, so check
+        # the range rather than the cents; NaN fails both
+        valid = (freqs >= self._low) & (freqs <= self._high)
+        cents[~valid] = np.nan
+        return np.where(valid, idx, -1), cents
+
+# tables already loaded by this process
+_tables = {}
+
+def cache_dir():
+    """
+    Directory things found once are cached in between runs,
+    $ICONDUCTOR_CACHE or ~/.cache/iconductor.
+    """
+    return os.environ.get('ICONDUCTOR_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'iconductor'))
+
+def load_table(a4=440.0, temperament='equal', root='C', low_octave=0, high_octave=8):
+    """
+    Return the :class:`NoteTable` for a tuning. Tables already built are
+    shared, so switching back and forth between tunings costs nothing.
+    Building one takes a fraction of a millisecond, less than reading it
+    back from disk would, so they aren't kept between runs.
+    """
+    key = (float(a4), temperament, root, low_octave, high_octave)
+    table = _tables.get(key)
+    if table is None:
+        table = _tables[key] = NoteTable(a4, low_octave, high_octave, temperament, root)
+    return table
@@ -0,0 +1,170 @@
+import os
+import csv
+import struct
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from numpy.lib.stride_tricks import sliding_window_view
+from detectors import DETECTORS, make_detector
+from notes import TEMPERAMENTS, NOTE_NAMES, NoteTable, load_table
+
+# Offline tuning reports for recorded rehearsals. The WAV file is memory
+# mapped, framed into overlapping windows without copying and the windows
+# are analysed a batch at a time with the detectors' frequencies() method,
+# so there is no per-window Python work apart from writing the report.
+# Archives of many files are spread over worker processes, each mapping
+# its own file and sending back only the compact result arrays.
+
+def wav_memmap(path):
+    """
+    Memory map a 16-bit PCM WAV file. Returns (samples, samp_rate) where
+    samples is a read only int16 array of the first channel.
+    """
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError('not a WAV file - %s' % path)
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError('no data chunk in %s' % path)
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(size-16+(size & 1), 1)
+            elif chunk_id == b'data':
+                offset = f.tell()
+                break
+            else:
+                # chunks are padded to an even length
+                f.seek(size+(size & 1), 1)
+    if fmt is None:
+        raise ValueError('no fmt chunk in %s' % path)
+    audio_format, chans, samp_rate, _, _, bits = fmt
+    if audio_format not in (1, 0xFFFE) or bits != 16:
+        raise ValueError('only 16-bit PCM WAV files are supported - %s' % path)
+    # recorders that were cut off can leave the data size wrong, so never
+    # map past the end of the file
+    frames = min(size, os.path.getsize(path)-offset)//(2*chans)
+    if frames == 0:
+        return np.zeros(0, dtype=np.int16), samp_rate
+    samples = np.memmap(path, dtype='<i2', mode='r', offset=offset, shape=(frames, chans))
+    return samples[:, 0], samp_rate
+
+def analyse(samples, samp_rate, detector="yin", chunk=4096, hop=1024, batch=256, table=None,
+            gate_dbfs=None):
+    """
+    Analyse every chunk sample window of samples, one every hop samples.
+    Returns a dict of arrays with one entry per window: 'time' (start of
+    the window in seconds), 'freq' (Hz, NaN when unpitched), 'note' (index
+    into table, -1 when unpitched) and 'cents'. Windows quieter than
+    gate_dbfs (dB below full scale) are marked unpitched without analysis.
+    """
+    if table is None:
+        table = NoteTable()
+    det = make_detector(detector, chunk, samp_rate, gate_dbfs=gate_dbfs)
+    if len(samples) < chunk:
+        windows = np.zeros((0, chunk), dtype=np.int16)
+    else:
+        windows = sliding_window_view(samples, chunk)[::hop]
+    freqs = np.empty(len(windows))
+    for start in range(0, len(windows), batch):
+        freqs[start:start+batch] = det.frequencies(windows[start:start+batch])
+    note, cents = table.lookup(freqs)
+    return {
+        'time': np.arange(len(windows))*hop/float(samp_rate),
+        'freq': freqs,
+        'note': note,
+        'cents': cents,
+    }
+
+def analyse_file(path, detector="yin", chunk=4096, hop=1024, gate_dbfs=None, table=None):
+    """
+    Analyse one WAV file, see :func:`analyse`. Returns (duration, result)
+    with the result arrays narrowed to float32/int16 so they are cheap to
+    send back from a worker process.
+    """
+    samples, samp_rate = wav_memmap(path)
+    result = analyse(samples, samp_rate, detector, chunk, hop, table=table, gate_dbfs=gate_dbfs)
+    result['freq'] = result['freq'].astype(np.float32)
+    result['note'] = result['note'].astype(np.int16)
+    result['cents'] = result['cents'].astype(np.float32)
+    result['time'] = result['time'].astype(np.float32)
+    return len(samples)/float(samp_rate), result
+
+def analyse_archive(paths, workers=None, detector="yin", chunk=4096, hop=1024, gate_dbfs=None, table=None):
+    """
+    Generator analysing every file in paths across a pool of worker
+    processes (one per core by default). Yields (path, duration, result)
+    in the order the files finish.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyse_file, path, detector, chunk, hop, gate_dbfs, table): path for path in paths}
+        for future in as_completed(futures):
+            duration, result = future.result()
+            yield futures[future], duration, result
+
+def write_csv(path, result, table):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['time', 'freq', 'note', 'octave', 'cents'])
+        for t, freq, i, cents in zip(result['time'], result['freq'], result['note'], result['cents']):
+            if i < 0:
+                writer.writerow(['%.3f' % t, '', '', '', ''])
+            else:
+                writer.writerow(['%.3f' % t, '%.2f' % freq, table.names[i], table.octaves[i], '%.1f' % cents])
+
+def wav_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith('.wav'):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+def report_path(path, out_dir, fmt):
+    base = os.path.splitext(os.path.basename(path))[0]+'.'+fmt
+    return os.path.join(out_dir if out_dir else os.path.dirname(path), base)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Note/cents timeline for WAV recordings")
+    parser.add_argument("paths", nargs="+", help="WAV files or directories of them")
+    parser.add_argument("--out", help="directory for the reports (default: next to each WAV)")
+    parser.add_argument("--format", choices=("csv", "npz"), default="csv")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default="yin")
+    parser.add_argument("--chunk", type=int, default=4096, help="samples per window")
+    parser.add_argument("--hop", type=int, default=1024, help="samples between windows")
+    parser.add_argument("--gate", type=float, default=None,
+                        help="skip windows quieter than this many dB below full scale, e.g. -50")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core, 1 runs in this process)")
+    parser.add_argument("--a4", type=float, default=440.0, help="frequency of A4 in Hz")
+    parser.add_argument("--temperament", choices=sorted(TEMPERAMENTS), default="equal")
+    parser.add_argument("--root", choices=NOTE_NAMES, default="C", help="note the temperament is built on")
+    args = parser.parse_args()
+
+    table = load_table(args.a4, args.temperament, args.root)
+    paths = list(wav_paths(args.paths))
+    if args.workers == 1:
+        results = ((path,)+analyse_file(path, args.detector, args.chunk, args.hop, args.gate, table)
+                   for path in paths)
+    else:
+        results = analyse_archive(paths, args.workers, args.detector, args.chunk, args.hop, args.gate, table)
+
+    start = time.perf_counter()
+    total = 0.0
+    for path, duration, result in results:
+        out = report_path(path, args.out, args.format)
+        if args.format == "csv":
+            write_csv(out, result, table)
+        else:
+            np.savez(out, **result)
+        total += duration
+        print('%s: %.1f s of audio -> %s' % (path, duration, out))
+    elapsed = time.perf_counter()-start
+    print('%d files, %.1f s of audio in %.2f s: %.1f s of audio per second'
+          % (len(paths), total, elapsed, total/max(elapsed, 1e-9)))
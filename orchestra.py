@@ -0,0 +1,238 @@
+import sys
+import time
+import asyncio
+import numpy as np
+from audio_source import RingBuffer
+from detectors import make_detector
+from gestures import GESTURES
+from latency import LatencyLog, servo_log
+from notes import NoteTable
+
+# Several conductor arms and tuners in one process. Every device is an
+# asyncio task with its own schedule of absolute deadlines, all counted from
+# one start time on one clock, so arms given the same tempo move in
+# lockstep. Tasks sleep on the event loop until just before each deadline,
+# then poll the clock for the last couple of milliseconds, as the loop's
+# timers can wake a millisecond late. The polling yields to the loop every
+# time round, so other devices run while one waits. It does still hold the
+# interpreter lock, which the threads analysing audio need to hand back
+# their results, so while the orchestra runs Python switches threads every
+# fifth of a millisecond instead of every five.
+#
+# Each device logs when every step was due and when it was done, so the
+# timing error of every device can be reported separately.
+
+class Orchestra(object):
+    """
+    Runs devices (:class:`Arm`, :class:`Tuner`) on one event loop and one
+    clock.
+
+    :param float spin:
+        Seconds before each deadline to stop sleeping and poll instead,
+        letting the other devices run between polls.
+
+    :param clock:
+        Function returning the time in integer nanoseconds.
+    """
+    def __init__(self, spin=0.002, clock=time.perf_counter_ns):
+        self.spin_ns = int(spin*1e9)
+        self.clock = clock
+        self.devices = []
+        self.start_ns = None
+
+    def add(self, device):
+        """
+        Add a device, returning it.
+        """
+        self.devices.append(device)
+        return device
+
+    async def sleep_until(self, deadline_ns):
+        """
+        Wait until the clock reaches deadline_ns, returning how late (in
+        nanoseconds) we were.
+        """
+        remaining = deadline_ns-self.clock()-self.spin_ns
+        if remaining > 0:
+            await asyncio.sleep(remaining/1e9)
+        now = self.clock()
+        while now < deadline_ns:
+            await asyncio.sleep(0)
+            now = self.clock()
+        return now-deadline_ns
+
+    async def _main(self, lead_in, duration):
+        # every device counts from the same start
+        self.start_ns = self.clock()+int(lead_in*1e9)
+        tasks = [asyncio.ensure_future(device.run(self)) for device in self.devices]
+        timeout = None if duration is None else lead_in+duration
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            # raise anything a device raised
+            task.result()
+
+    def run(self, duration=None, lead_in=0.1, switch_interval=0.0002):
+        """
+        Run every device until they have all finished, or for duration
+        seconds. The first deadlines are lead_in seconds from now.
+        """
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(switch_interval)
+        try:
+            asyncio.run(self._main(lead_in, duration))
+        finally:
+            sys.setswitchinterval(interval)
+
+    def report(self):
+        """
+        Return the timing error of every device, from each step being due
+        to it being done, in milliseconds.
+        """
+        return dict((device.name, device.log.report()['total']) for device in self.devices)
+
+
+class Arm(object):
+    """
+    A conductor arm, three servos conducting a gesture.
+
+    :param str name:
+        Name for reports.
+
+    :param tuple servos:
+        The three servos, in pattern order.
+
+    :param str meter:
+        One of :data:`gestures.GESTURES`.
+
+    :param float bpm:
+        Tempo in beats per minute.
+
+    :param int num_beats:
+        Beats to conduct, or None for as long as the orchestra runs.
+    """
+    def __init__(self, name, servos, meter='4/4', bpm=60.0, num_beats=None, log_size=4096):
+        self.name = name
+        self.servos = servos
+        self.gesture = GESTURES[meter]
+        self.interval_ns = 60e9/bpm
+        self.num_beats = num_beats
+        self.log = servo_log(log_size)
+
+    async def run(self, orchestra):
+        gesture = self.gesture
+        writes = gesture.writes
+        servos = self.servos
+        log = self.log
+        if self.num_beats is None:
+            bars = None
+        else:
+            bars = -(-self.num_beats//gesture.beats)
+        offsets = gesture.offsets.tolist()
+        bar = 0
+        while bars is None or bar < bars:
+            for k, offset in enumerate(offsets):
+                position = bar*gesture.beats+offset
+                if self.num_beats is not None and position >= self.num_beats:
+                    return
+                due = orchestra.start_ns+int(round(position*self.interval_ns))
+                late = await orchestra.sleep_until(due)
+                for j, value in writes[k]:
+                    servos[j].value = value
+                log.record(due, due+late, log.now())
+            bar += 1
+
+
+class Tuner(object):
+    """
+    A tuner analysing one hop of audio on every hop deadline and showing
+    the note when it changes.
+
+    :param str name:
+        Name for reports.
+
+    :param source:
+        Audio source from audio_source.py. Reads must not block, so use a
+        file or synthetic source; they are paced by the hop deadlines.
+
+    :param show:
+        Function called with the note name, or None, when it changes, e.g.
+        ``lambda note: real_time.show_note(note, top, bot)``.
+    """
+    def __init__(self, name, source, show, detector="yin", chunk=4096, hop=1024, table=None,
+                 gate_dbfs=None, log_size=4096):
+        self.name = name
+        self.source = source
+        self.show = show
+        self.chunk = chunk
+        self.hop = hop
+        self.detector = make_detector(detector, chunk, source.samp_rate, gate_dbfs=gate_dbfs)
+        self.table = NoteTable() if table is None else table
+        self.hop_ns = 1e9*hop/source.samp_rate
+        self.log = LatencyLog(('scheduled', 'woke', 'analysed', 'written'), log_size)
+        self.note = None
+
+    async def run(self, orchestra):
+        samples = RingBuffer(self.chunk)
+        frame = np.zeros(self.chunk, dtype=np.int16)
+        log = self.log
+        loop = asyncio.get_running_loop()
+        n = 0
+        while True:
+            # a hop is due once all of it would have arrived
+            n += 1
+            due = orchestra.start_ns+int(round(n*self.hop_ns))
+            late = await orchestra.sleep_until(due)
+            data = np.frombuffer(self.source.read(self.hop), dtype=np.int16)
+            if len(data) < self.hop:
+                return
+            samples.write(data)
+            if samples.count < self.chunk:
+                continue
+            # in a worker thread, NumPy lets the arms run during the FFTs
+            freq = await loop.run_in_executor(None, self.detector.frequency, samples.latest(frame))
+            analysed = log.now()
+            found = self.table.nearest(freq)
+            note = None if found is None else found[0]
+            if note != self.note:
+                self.note = note
+                self.show(note)
+            log.record(due, due+late, analysed, log.now())
+
+if __name__ == "__main__":
+    import argparse
+    import hardware
+    from audio_source import SineSource
+    from real_time import note_chars
+
+    parser = argparse.ArgumentParser(description="Conduct several arms and run several tuners at once")
+    parser.add_argument("--arm", action="append", default=[],
+                        help="servo pins of an arm, e.g. 27,22,17; may be repeated")
+    parser.add_argument("--virtual-arms", type=int, default=0, help="simulated arms without pins")
+    parser.add_argument("--tuners", type=int, default=0, help="simulated tuners on synthetic tones")
+    parser.add_argument("--meter", choices=list(GESTURES), default="4/4")
+    parser.add_argument("--bpm", type=float, default=90)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mock", action="store_true", help="simulated pins, no Pi needed, see hardware.py")
+    args = parser.parse_args()
+
+    hardware.use('sim' if args.mock else None)
+    orchestra = Orchestra()
+    for i, pins in enumerate(args.arm):
+        servos = hardware.servos(tuple(int(p) for p in pins.split(',')))
+        orchestra.add(Arm('arm%d' % i, servos, args.meter, args.bpm))
+    for i in range(args.virtual_arms):
+        orchestra.add(Arm('virtual%d' % i, hardware.virtual_servos('virtual%d' % i), args.meter, args.bpm))
+    for i in range(args.tuners):
+        display = hardware.VirtualOutput('tuner%d' % i)
+        def show(note, display=display):
+            display.value = note_chars(note)
+        tone = SineSource(220*2**(i/12.0), harmonics=(1, 0.5, 0.3))
+        orchestra.add(Tuner('tuner%d' % i, tone, show))
+
+    orchestra.run(args.seconds)
+    for name, r in orchestra.report().items():
+        if r['n']:
+            print('%-10s p50 %.3f ms, p95 %.3f ms, p99 %.3f ms, max %.3f ms over %d'
+                  % (name, r['p50_ms'], r['p95_ms'], r['p99_ms'], r['max_ms'], r['n']))
@@ -0,0 +1,211 @@
+import time
+import threading
+import numpy as np
+from audio_source import FrameRing, RingBuffer
+from hardware import audio_input
+from latency import tuner_logs
+from detectors import make_detector
+from notes import NoteTable
+
+# The tuner split over three threads so slow display or servo writes can
+# never hold up audio capture:
+#
+#   capture   PyAudio's callback (or a thread reading a file or synthetic
+#             source) pushes each hop into a preallocated FrameRing.
+#   analysis  takes hops off the ring, keeps the analysis window and runs
+#             the detector every hop. NumPy drops the GIL inside the FFTs.
+#   output    wakes up only when the note changes and updates the hardware.
+#
+# Analysis hands results to output by replacing a single tuple, so output
+# always sees the latest note and never queues up stale ones.
+#
+# Every hop is stamped when it is captured, and the analysis and output
+# threads log when they start and finish with it, so the latency from sound
+# to display is always available from :attr:`latency`.
+
+class TunerPipeline(object):
+    """
+    Threaded capture, analysis and output for the tuner.
+
+    :param source:
+        An audio source from audio_source.py, or ``None`` to open the
+        microphone (see hardware.py) in callback mode.
+
+    :param output:
+        Function called from the output thread with (name, octave, cents),
+        or ``None`` when the note goes away.
+
+    :param str detector:
+        Name of the pitch detector, see detectors.py.
+
+    :param int slots:
+        Hops the capture ring holds; at 1024 samples 64 slots is about 1.5
+        seconds of slack for the analysis thread.
+
+    :param float gate_dbfs:
+        Noise gate level, see :class:`detectors.GatedDetector`. Readings
+        the detector isn't confident about leave the last note showing.
+
+    :param bool realtime:
+        Play non-live sources back at their real rate. If ``False`` they are
+        read as fast as the analysis keeps up.
+
+    :param dict latency:
+        Logs to time the hops and notes shown in, see
+        :func:`latency.tuner_logs`. New ones are made by default.
+    """
+    def __init__(self, source, output, detector="yin", chunk=4096, hop=1024, samp_rate=44100,
+                 dev_index=2, slots=64, realtime=True, table=None, gate_dbfs=None, min_confidence=0.0,
+                 latency=None):
+        self.source = source
+        self.output = output
+        self.chunk = chunk
+        self.hop = hop
+        self.samp_rate = samp_rate if source is None else source.samp_rate
+        self.dev_index = dev_index
+        self.realtime = realtime
+        self.detector = make_detector(detector, chunk, self.samp_rate, gate_dbfs=gate_dbfs,
+                                      min_confidence=min_confidence)
+        self.table = NoteTable() if table is None else table
+        self.ring = FrameRing(slots, hop)
+        self.result = None
+        # the result and its stamps, replaced together
+        self._latest = (None, None)
+        self.latency = tuner_logs() if latency is None else latency
+        self.captured = 0
+        self.analysed = 0
+        self.updates = 0
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._threads = []
+        self._stream = None
+
+    def _push(self, data):
+        self.captured += 1
+        self.ring.push(data, time.perf_counter_ns())
+
+    def _capture(self):
+        start = time.perf_counter()
+        period = self.hop/float(self.samp_rate)
+        n = 0
+        while not self._stop.is_set():
+            data = self.source.read(self.hop)
+            if len(data) < 2*self.hop:
+                break
+            n += 1
+            if self.realtime:
+                delay = start+n*period-time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                # a file can wait for the analysis, unlike a microphone
+                while len(self.ring) >= self.ring.slots and not self._stop.is_set():
+                    time.sleep(0.001)
+            self._push(data)
+        self._done.set()
+
+    def _analyse(self):
+        block = np.zeros(self.hop, dtype=np.int16)
+        samples = RingBuffer(self.chunk)
+        frame = np.zeros(self.chunk, dtype=np.int16)
+        last = None
+        log = self.latency['analysis']
+        clock = log.now
+        while not self._stop.is_set():
+            if not self.ring.get(block, timeout=0.1):
+                if self._done.is_set() and len(self.ring) == 0:
+                    break
+                continue
+            samples.write(block)
+            if samples.count < self.chunk:
+                continue
+            start = clock()
+            freq = self.detector.frequency(samples.latest(frame))
+            end = clock()
+            self.analysed += 1
+            if freq is None and not getattr(self.detector, 'silent', True):
+                log.record(self.ring.stamp, start, end, end)
+                continue
+            found = self.table.nearest(freq)
+            note = None if found is None else found[0]
+            stamps = (self.ring.stamp, start, end, clock())
+            log.record(*stamps)
+            if note != last:
+                last = note
+                self.result = found
+                self._latest = (found, stamps)
+                self._changed.set()
+        # let output finish with the last result
+        self._stop.set()
+        self._changed.set()
+
+    def _output(self):
+        shown = None
+        log = self.latency['output']
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            # checked before reading the result, which is final once stopping
+            stopping = self._stop.is_set()
+            result, stamps = self._latest
+            if result is not shown:
+                shown = result
+                self.output(result)
+                log.record(*(stamps+(log.now(),)))
+                self.updates += 1
+            if stopping:
+                break
+
+    def start(self):
+        """
+        Start the capture, analysis and output threads.
+        """
+        workers = [self._analyse, self._output]
+        if self.source is None:
+            self._stream = audio_input(self.dev_index, self.samp_rate, self.hop, callback=self._push)
+        else:
+            workers.append(self._capture)
+        for target in workers:
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Stop capturing, and wait for the threads to finish.
+        """
+        self._stop.set()
+        self._changed.set()
+        if self._stream is not None:
+            self._stream.close()
+        for thread in self._threads:
+            thread.join()
+
+    def wait(self):
+        """
+        Wait for a file or finite synthetic source to run out.
+        """
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self):
+        """
+        Return counters for captured, analysed and dropped hops and the
+        number of output updates.
+        """
+        return {
+            'captured': self.captured,
+            'analysed': self.analysed,
+            'overflows': self.ring.overflows,
+            'high_water': self.ring.high_water,
+            'updates': self.updates,
+        }
+
+    def latency_report(self):
+        """
+        Return the p50, p95 and p99 latency of each stage in milliseconds,
+        for every hop analysed and every note shown.
+        """
+        return dict((name, log.report()) for name, log in self.latency.items())
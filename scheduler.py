@@ -0,0 +1,147 @@
+import time
+import threading
+
+class BeatScheduler(object):
+    """
+    Waits for evenly spaced beats against absolute deadlines on a
+    monotonic clock, so time spent moving the servos between beats and
+    oversleeping never add up into drift.
+
+    Each :meth:`wait` sleeps until the next deadline, start + n*interval.
+    Most of the wait is a normal sleep; the last ``spin`` seconds are spent
+    polling the clock, because a sleep can wake up a millisecond or more
+    late on a busy Pi. How late each beat actually was is kept in
+    :attr:`lateness` (nanoseconds).
+
+    The tempo and phase may be changed from another thread (a button, the
+    beat tracker) while a conductor waits: the start and interval are kept
+    as one tuple, replaced whole, so a deadline never mixes an old start
+    with a new interval.
+
+    :param float interval:
+        Seconds between beats, 60/BPM.
+
+    :param float spin:
+        Seconds before each deadline to stop sleeping and poll instead.
+
+    :param clock:
+        Function returning the time in integer nanoseconds.
+
+    :param sleep:
+        Function sleeping for a number of seconds.
+    """
+    def __init__(self, interval, spin=0.002, clock=time.perf_counter_ns, sleep=time.sleep):
+        self.spin_ns = int(spin*1e9)
+        self._clock = clock
+        self._sleep = sleep
+        # (start_ns, interval_ns), read and replaced together
+        self._timing = (None, int(round(interval*1e9)))
+        self._lock = threading.Lock()
+        self.beat = 0
+        # last beat position waited for
+        self.position = 0
+        self.lateness = []
+
+    def start(self, at_ns=None):
+        """
+        Start counting beats from now, or from the clock time at_ns. The
+        first :meth:`wait` returns one interval later.
+        """
+        with self._lock:
+            self._timing = (self._clock() if at_ns is None else at_ns, self._timing[1])
+        self.beat = 0
+        self.position = 0
+        self.lateness = []
+
+    @property
+    def start_ns(self):
+        return self._timing[0]
+
+    @property
+    def interval_ns(self):
+        return self._timing[1]
+
+    @property
+    def timing(self):
+        """
+        (start_ns, interval_ns) as one consistent pair.
+        """
+        return self._timing
+
+    def set_interval(self, interval):
+        """
+        Change the tempo from the last beat waited for on, so the next beat
+        is due one new interval after it.
+        """
+        interval_ns = int(round(interval*1e9))
+        with self._lock:
+            start_ns, old = self._timing
+            if start_ns is not None:
+                anchor = start_ns+int(round(self.position*old))
+                start_ns = anchor-int(round(self.position*interval_ns))
+            self._timing = (start_ns, interval_ns)
+
+    def shift(self, offset_ns):
+        """
+        Move every following beat later by offset_ns (earlier if negative),
+        to pull the beat into phase with something outside.
+        """
+        with self._lock:
+            start_ns, interval_ns = self._timing
+            if start_ns is not None:
+                self._timing = (start_ns+int(offset_ns), interval_ns)
+
+    def deadline(self, beat):
+        """
+        Return the clock time in nanoseconds that beat (which may be
+        fractional) is due.
+        """
+        start_ns, interval_ns = self._timing
+        return start_ns+int(round(beat*interval_ns))
+
+    def sleep_until(self, deadline_ns):
+        """
+        Sleep until the clock reaches deadline_ns, returning how late (in
+        nanoseconds) we actually woke up.
+        """
+        remaining = deadline_ns-self._clock()
+        if remaining > self.spin_ns:
+            self._sleep((remaining-self.spin_ns)/1e9)
+        now = self._clock()
+        while now < deadline_ns:
+            now = self._clock()
+        return now-deadline_ns
+
+    def wait(self):
+        """
+        Wait for the next beat. Returns its lateness in nanoseconds.
+        """
+        if self.start_ns is None:
+            self.start()
+        self.beat += 1
+        return self.wait_for(self.beat)
+
+    def wait_for(self, position):
+        """
+        Wait until beat position, which may be fractional (1.5 is half way
+        between the first and second beats). Returns the lateness in
+        nanoseconds.
+        """
+        if self.start_ns is None:
+            self.start()
+        self.position = position
+        late = self.sleep_until(self.deadline(position))
+        self.lateness.append(late)
+        return late
+
+    def report(self):
+        """
+        Return a summary of the lateness so far, in milliseconds.
+        """
+        if not self.lateness:
+            return {'beats': 0, 'mean_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'beats': len(self.lateness),
+            'mean_ms': sum(self.lateness)/len(self.lateness)/1e6,
+            'max_ms': max(self.lateness)/1e6,
+        }
@@ -0,0 +1,264 @@
+import struct
+import time
+import numpy as np
+from gestures import GESTURES
+from scheduler import BeatScheduler
+
+# Conducting a whole piece from a standard MIDI file. Only the tempo and
+# time signature meta events matter, so the file is read by a small parser
+# of our own. Before playback the meter and tempo maps are compiled into
+# flat arrays, one entry per keyframe: when it is due (nanoseconds from the
+# first downbeat) and which gesture and keyframe it is. The playback loop
+# then only waits and indexes, however often the piece changes meter or
+# tempo.
+
+# microseconds per quarter note until the first tempo event, 120 BPM
+DEFAULT_TEMPO = 500000
+
+def _varlen(data, pos):
+    # MIDI variable length quantity, seven bits a byte, high bit set on all
+    # but the last
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+def read_midi(path):
+    """
+    Read the timing of a standard MIDI file. Returns a dict with
+    'division' (ticks per quarter note, or for SMPTE timed files a
+    negative number of ticks per second), 'tempos' and 'meters' (lists of
+    (tick, microseconds per quarter) and (tick, numerator, denominator)
+    in tick order) and 'end' (tick of the last end of track).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'MThd':
+        raise ValueError('not a standard MIDI file - %s' % path)
+    length, fmt, ntracks, division = struct.unpack('>IHHH', data[4:14])
+    if division & 0x8000:
+        # frames per second (stored negated) times ticks per frame
+        fps = 256-(division >> 8)
+        division = -fps*(division & 0xFF)
+    pos = 8+length
+    tempos = []
+    meters = []
+    end = 0
+    for _ in range(ntracks):
+        if data[pos:pos+4] != b'MTrk':
+            raise ValueError('bad track chunk in %s' % path)
+        size, = struct.unpack('>I', data[pos+4:pos+8])
+        pos += 8
+        stop = pos+size
+        tick = 0
+        status = 0
+        while pos < stop:
+            delta, pos = _varlen(data, pos)
+            tick += delta
+            byte = data[pos]
+            if byte == 0xFF:
+                kind = data[pos+1]
+                size, pos = _varlen(data, pos+2)
+                body = data[pos:pos+size]
+                pos += size
+                if kind == 0x51 and size == 3:
+                    tempos.append((tick, (body[0] << 16) | (body[1] << 8) | body[2]))
+                elif kind == 0x58 and size >= 2:
+                    meters.append((tick, body[0], 1 << body[1]))
+                elif kind == 0x2F:
+                    break
+            elif byte in (0xF0, 0xF7):
+                size, pos = _varlen(data, pos+1)
+                pos += size
+            else:
+                if byte & 0x80:
+                    status = byte
+                    pos += 1
+                elif not status:
+                    raise ValueError('running status without a status byte in %s' % path)
+                # program change and channel pressure have one data byte
+                pos += 1 if status & 0xE0 == 0xC0 else 2
+        end = max(end, tick)
+        pos = stop
+    # a stable sort keeps the file order of events on the same tick, and the
+    # last of them wins
+    tempos.sort(key=lambda e: e[0])
+    meters.sort(key=lambda e: e[0])
+    return {'division': division, 'tempos': tempos, 'meters': meters, 'end': end}
+
+def gesture_for(numerator, denominator):
+    """
+    Return the name of the gesture conducting a meter: its own if there is
+    one, otherwise the pattern with the closest number of beats (2/2 is
+    conducted as 2/4, 7/8 as 6/8). Compound meters without a pattern of
+    their own are conducted in dotted beats, 9/8 in three. The pattern's
+    beats always divide the bar evenly.
+    """
+    name = '%d/%d' % (numerator, denominator)
+    if name in GESTURES:
+        return name
+    beats = numerator
+    if denominator >= 8 and numerator > 3 and numerator % 3 == 0:
+        beats = numerator//3
+    # the simpler pattern on a tie
+    return min(GESTURES, key=lambda name: (abs(GESTURES[name].beats-beats), GESTURES[name].beats))
+
+
+class Score(object):
+    """
+    A piece's keyframes compiled ahead of time from its tempo and meter
+    maps.
+
+    :attr:`times_ns` holds when each keyframe is due in nanoseconds from the
+    first downbeat, :attr:`gesture_ids` its gesture as an index into
+    :attr:`names` and :attr:`keyframes` its keyframe within the gesture.
+    :attr:`bars` has (bar number, time in seconds, gesture name, beats per
+    minute) where the meter or tempo changes, for display.
+
+    :param dict timing:
+        As returned by :func:`read_midi`.
+    """
+    def __init__(self, timing):
+        division = timing['division']
+        end = timing['end']
+        meters = [(0, 4, 4)]+list(timing['meters'])
+        tempos = [(0, DEFAULT_TEMPO)]+list(timing['tempos'])
+        # events on the same tick, the last one wins
+        meters = [m for i, m in enumerate(meters) if i+1 == len(meters) or meters[i+1][0] != m[0]]
+        tempos = [t for i, t in enumerate(tempos) if i+1 == len(tempos) or tempos[i+1][0] != t[0]]
+
+        # seconds at each tempo change, and seconds per tick after it
+        self._tempo_ticks = np.array([t for t, _ in tempos], dtype=float)
+        if division < 0:
+            # SMPTE time has no tempo, count quarter notes at 120 BPM
+            rate = np.full(len(tempos), 1.0/-division)
+            quarter = -division/2.0
+        else:
+            rate = np.array([us for _, us in tempos], dtype=float)/1e6/division
+            quarter = float(division)
+        self._tempo_rate = rate
+        self._tempo_seconds = np.concatenate([[0.0], np.cumsum(np.diff(self._tempo_ticks)*rate[:-1])])
+
+        self.names = list(GESTURES)
+        ticks = []
+        ids = []
+        frames = []
+        starts = []
+        for i, (tick, num, den) in enumerate(meters):
+            if tick >= end and i > 0:
+                break
+            name = gesture_for(num, den)
+            gesture = GESTURES[name]
+            stop = meters[i+1][0] if i+1 < len(meters) else end
+            # a bar is num of the denominator's note value, split into the
+            # gesture's beats
+            bar = 4.0/den*quarter*num
+            beat = bar/gesture.beats
+            bars = max(1, int(np.ceil((stop-tick)/bar)))
+            offsets = (np.arange(bars)[:, None]*bar+gesture.offsets*beat).ravel()+tick
+            keep = offsets < max(stop, tick+1)
+            ticks.append(offsets[keep])
+            ids.append(np.full(np.count_nonzero(keep), self.names.index(name)))
+            frames.append(np.tile(np.arange(len(gesture.offsets)), bars)[keep])
+            starts.append((tick+np.arange(bars)*bar, name, beat))
+        self.ticks = np.concatenate(ticks)
+        self.gesture_ids = np.concatenate(ids).astype(np.int16)
+        self.keyframes = np.concatenate(frames).astype(np.int16)
+        self.times_ns = np.round(self.seconds(self.ticks)*1e9).astype(np.int64)
+        # the writes for every keyframe, looked up now so playback doesn't
+        self.writes = [GESTURES[self.names[g]].writes[k]
+                       for g, k in zip(self.gesture_ids.tolist(), self.keyframes.tolist())]
+
+        # bars where the meter or tempo changes
+        self.bars = []
+        number = 1
+        last = None
+        for bar_ticks, name, beat in starts:
+            seconds = self.seconds(bar_ticks)
+            bpm = 60.0/(beat*self.rate(bar_ticks))
+            for s, b in zip(seconds.tolist(), bpm.tolist()):
+                if (name, round(b, 2)) != last:
+                    last = (name, round(b, 2))
+                    self.bars.append((number, s, name, b))
+                number += 1
+
+    @classmethod
+    def load(cls, path):
+        """
+        Compile the score of a MIDI file.
+        """
+        return cls(read_midi(path))
+
+    def __len__(self):
+        return len(self.times_ns)
+
+    def rate(self, ticks):
+        """
+        Return the seconds per tick in force at each of ticks.
+        """
+        i = np.searchsorted(self._tempo_ticks, ticks, side='right')-1
+        return self._tempo_rate[i]
+
+    def seconds(self, ticks):
+        """
+        Return the time in seconds from the start of each of ticks.
+        """
+        ticks = np.asarray(ticks, dtype=float)
+        i = np.searchsorted(self._tempo_ticks, ticks, side='right')-1
+        return self._tempo_seconds[i]+(ticks-self._tempo_ticks[i])*self._tempo_rate[i]
+
+    def duration(self):
+        """
+        Return the time of the last keyframe in seconds.
+        """
+        return self.times_ns[-1]/1e9 if len(self) else 0.0
+
+    def play(self, servos, lead_in=None, scheduler=None, log=None):
+        """
+        Conduct the score on servos. The first downbeat comes lead_in
+        seconds after the call, one beat of the opening tempo by default,
+        like :func:`gestures.conduct`. log is an optional
+        :class:`latency.LatencyLog` as for :func:`gestures.conduct`. Returns
+        the scheduler so its lateness can be reported.
+        """
+        if scheduler is None:
+            scheduler = BeatScheduler(1.0)
+        if lead_in is None:
+            lead_in = 60.0/self.bars[0][3] if self.bars else 0.5
+        scheduler.start()
+        start = scheduler.start_ns+int(round(lead_in*1e9))
+        writes = self.writes
+        for i, due in enumerate(self.times_ns.tolist()):
+            due += start
+            late = scheduler.sleep_until(due)
+            scheduler.lateness.append(late)
+            for j, value in writes[i]:
+                servos[j].value = value
+            if log is not None:
+                log.record(due, due+late, log.now())
+        return scheduler
+
+if __name__ == "__main__":
+    import argparse
+    import hardware
+
+    parser = argparse.ArgumentParser(description="Conduct the tempo and meter changes of a MIDI file")
+    parser.add_argument("path", help="standard MIDI file")
+    parser.add_argument("--list", action="store_true", help="only list the meter and tempo changes")
+    parser.add_argument("--mock", action="store_true", help="simulated pins, no Pi needed, see hardware.py")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    score = Score.load(args.path)
+    print('%d keyframes, %.1f s, compiled in %.1f ms'
+          % (len(score), score.duration(), 1000*(time.perf_counter()-start)))
+    for number, seconds, name, bpm in score.bars:
+        print('bar %4d  %7.2f s  %-5s %6.1f BPM' % (number, seconds, name, bpm))
+    if not args.list:
+        hardware.use('sim' if args.mock else None)
+        scheduler = score.play(hardware.servos())
+        print('Beat lateness: mean %(mean_ms).2f ms, max %(max_ms).2f ms over %(beats)d keyframes'
+              % scheduler.report())
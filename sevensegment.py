@@ -0,0 +1,362 @@
+import math
+import time
+import threading
+from gpiozero import LEDBoard, OutputDeviceError, LEDCollection
+from scheduler import BeatScheduler
+
+# segments lit for each character, in the segment order A, B, C, D, E, F, G
+LAYOUTS = {
+    '1': (False, True, True, False, False, False, False),
+    '2': (True, True, False, True, True, False, True),
+    '3': (True, True, True, True, False, False, True),
+    '4': (False, True, True, False, False, True, True),
+    '5': (True, False, True, True, False, True, True),
+    '6': (True, False, True, True, True, True, True),
+    '7': (True, True, True, False, False, False, False),
+    '8': (True, True, True, True, True, True, True),
+    '9': (True, True, True, True, False, True, True),
+    '0': (True, True, True, True, True, True, False),
+    'A': (True, True, True, False, True, True, True),
+    'B': (False, False, True, True, True, True, True),
+    'C': (True, False, False, True, True, True, False),
+    'D': (False, True, True, True, True, False, True),
+    'E': (True, False, False, True, True, True, True),
+    'F': (True, False, False, False, True, True, True),
+    'G': (True, False, True, True, True, True, False),
+    'H': (False, True, True, False, True, True, True),
+    'I': (False, False, False, False, True, True, False),
+    'J': (False, True, True, True, True, False, False),
+    'K': (True, False, True, False, True, True, True),
+    'L': (False, False, False, True, True, True, False),
+    'M': (True, False, True, False, True, False, False),
+    'N': (True, True, True, False, True, True, False),
+    'O': (True, True, True, True, True, True, False),
+    'P': (True, True, False, False, True, True, True),
+    'Q': (True, True, False, True, False, True, True),
+    'R': (True, True, False, False, True, True, False),
+    'S': (True, False, True, True, False, True, True),
+    'T': (False, False, False, True, True, True, True),
+    'U': (False, False, True, True, True, False, False),
+    'V': (False, True, True, True, True, True, False),
+    'W': (False, True, False, True, False, True, False),
+    'X': (False, True, True, False, True, True, True),
+    'Y': (False, True, True, True, False, True, True),
+    'Z': (True, True, False, True, True, False, True),
+    '-': (False, False, False, False, False, False, True),
+    ' ': (False, False, False, False, False, False, False),
+    '=': (False, False, False, True, False, False, True),
+    # sharps are shown as '=' on the tuner
+    '#': (False, False, False, True, False, False, True)
+}
+
+class SevenSegmentDisplay(LEDBoard):
+    """
+    Extends :class:`LEDBoard` for a 7 segment LED display 
+
+    7 segment displays have either 7 or 8 pins, 7 pins for the digit display 
+    and an optional 8th pin for a decimal point. 7 segment displays 
+    typically have either a common anode or common cathode pin, when
+    using a common anode display 'active_high' should be set to False.
+    Instances of this class can be used to display characters or control 
+    individual leds on the display. For example::
+
+        from gpiozero import SevenSegmentDisplay
+
+        seven = SevenSegmentDisplay(1,2,3,4,5,6,7,8,active_high=False)
+        seven.display("7")
+    
+    :param int \*pins:
+        Specify the GPIO pins that the 7 segment display is attached to.
+        Pins should be in the LED segment order A,B,C,D,E,F,G,decimal_point 
+        (the decimal_point is optional).
+
+    :param bool pwm:
+        If ``True``, construct :class:`PWMLED` instances for each pin. If
+        ``False`` (the default), construct regular :class:`LED` instances. This
+        parameter can only be specified as a keyword parameter.
+
+    :param bool active_high:
+        If ``True`` (the default), the :meth:`on` method will set all the
+        associated pins to HIGH. If ``False``, the :meth:`on` method will set
+        all pins to LOW (the :meth:`off` method always does the opposite). This
+        parameter can only be specified as a keyword parameter.
+
+    :param bool initial_value:
+        If ``False`` (the default), all LEDs will be off initially. If
+        ``None``, each device will be left in whatever state the pin is found
+        in when configured for output (warning: this can be on). If ``True``,
+        the device will be switched on initially. This parameter can only be
+        specified as a keyword parameter.    
+    
+    """
+    def __init__(self, *pins, **kwargs):
+        # 7 segment displays must have 7 or 8 pins
+        if len(pins) < 7 or len(pins) > 8:
+            raise ValueError('SevenSegmentDisplay must have 7 or 8 pins')
+        # Don't allow 7 segments to contain collections
+        for pin in pins:
+            assert not isinstance(pin, LEDCollection)
+        pwm = kwargs.pop('pwm', False)
+        active_high = kwargs.pop('active_high', True)
+        initial_value = kwargs.pop('initial_value', False)
+        if kwargs:
+            raise TypeError('unexpected keyword argument: %s' % kwargs.popitem()[0])
+
+        # layouts are kept as 7-bit masks, bit n for segment n (A is bit 0)
+        self._layouts = {}
+        for char, layout in LAYOUTS.items():
+            self.set_char_layout(char, layout)
+
+        super(SevenSegmentDisplay, self).__init__(*pins, pwm=pwm, active_high=active_high, initial_value=initial_value)
+        # the segments currently lit, so display only writes the ones that change
+        self._sync()
+
+    def _sync(self):
+        self._mask = _mask(self[led].value for led in range(7))
+
+    def on(self, *args, **kwargs):
+        super(SevenSegmentDisplay, self).on(*args, **kwargs)
+        self._sync()
+
+    def off(self, *args, **kwargs):
+        super(SevenSegmentDisplay, self).off(*args, **kwargs)
+        self._sync()
+
+    def toggle(self, *args, **kwargs):
+        super(SevenSegmentDisplay, self).toggle(*args, **kwargs)
+        self._sync()
+
+    def _layout(self, char):
+        # both cases are in the table, so the usual characters need no work
+        try:
+            return self._layouts[char]
+        except (KeyError, TypeError):
+            pass
+        char = str(char).upper()
+        if len(char) > 1:
+            raise ValueError('only a single character can be displayed')
+        if char not in self._layouts:
+            raise ValueError('there is no layout for character - %s' % char)
+        return self._layouts[char]
+
+    def _write(self, mask):
+        for led in _CHANGED[mask ^ self._mask]:
+            self[led].value = (mask >> led) & 1
+        self._mask = mask
+    
+    def display(self, char):
+        """
+        Display a character on the 7 segment display
+
+        :param string char:
+            A single character to be displayed 
+        """
+        self._write(self._layout(char))
+            
+    def display_hex(self, hexnumber):
+        """
+        Display a hex number (0-F) on the 7 segment display
+
+        :param int hexnumber:
+            The number to be displayed in hex 
+        """
+        self.display(hex(hexnumber)[2:])
+
+    @property
+    def decimal_point(self):
+        """
+        Represents the status of the decimal point led
+        """
+        # does the 7seg display have a decimal point (i.e pin 8)
+        if len(self) > 7:
+            return self[7].value 
+        else:
+            raise OutputDeviceError('there is no 8th pin for the decimal point')
+    
+    @decimal_point.setter
+    def decimal_point(self, value):
+        """
+        Sets the status of the decimal point led
+        """
+        if len(self) > 7:
+            self[7].value = value
+        else:
+            raise OutputDeviceError('there is no 8th pin for the decimal point')    
+    
+    def set_char_layout(self, char, layout):
+        """
+        Create or update a custom character layout, which can be used with the 
+        `display` method.
+
+        :param string char:
+            A single character to be displayed 
+            
+        :param tuple layout:
+            A 7 bool tuple of LED values in the segment order A, B, C, D, E, F, G
+        """
+        char = str(char).upper()
+        if len(char) != 1:
+            raise ValueError('only a single character can be used in a layout')
+        if len(layout) != 7:
+            raise ValueError('a character layout must have 7 segments')
+        self._layouts[char] = self._layouts[char.lower()] = _mask(layout)
+
+def _mask(layout):
+    mask = 0
+    for led, value in enumerate(layout):
+        if value:
+            mask |= 1 << led
+    return mask
+
+# the segments to write for every possible difference between two layouts
+_CHANGED = tuple(tuple(led for led in range(7) if diff & (1 << led)) for diff in range(128))
+
+def display_many(displays, chars):
+    """
+    Display one character on each of several 7 segment displays, e.g.
+    ``display_many((top, bot), "A=")``. Every character is checked before
+    any display is touched, and only segments that change are written.
+    """
+    if len(chars) != len(displays):
+        raise ValueError('need one character per display')
+    masks = [display._layout(char) for display, char in zip(displays, chars)]
+    for display, mask in zip(displays, masks):
+        display._write(mask)
+
+
+class MultiplexedDisplay(object):
+    """
+    Drives several 7 segment digits from one set of segment lines, lighting
+    one digit at a time through its enable pin fast enough that they all
+    look lit. Two digits need 9 GPIOs instead of 14, which leaves the servo
+    pins 17, 22 and 27 free. For example::
+
+        disp = MultiplexedDisplay((5, 6, 13, 19, 26, 12, 20), (16, 21))
+        disp.show("A#")
+
+    A background thread refreshes the digits against absolute deadlines so
+    each one is lit for the same time; :meth:`stats` reports how steady
+    that was.
+
+    :param tuple segment_pins:
+        GPIO pins of the shared segment lines, in the order A, B, C, D, E,
+        F, G.
+
+    :param tuple digit_pins:
+        GPIO pin of each digit's enable line, left to right.
+
+    :param float refresh:
+        Times per second every digit is lit; 100 or more avoids flicker.
+
+    :param bool active_high:
+        ``False`` for common anode segment lines.
+
+    :param bool digit_active_high:
+        ``False`` if a digit is enabled by pulling its pin low.
+    """
+    def __init__(self, segment_pins, digit_pins, refresh=100, active_high=True,
+                 digit_active_high=True, spin=0.0002, clock=time.perf_counter_ns, sleep=time.sleep):
+        if len(segment_pins) != 7:
+            raise ValueError('MultiplexedDisplay needs 7 segment pins')
+        self.segments = LEDBoard(*segment_pins, active_high=active_high)
+        self.digits = LEDBoard(*digit_pins, active_high=digit_active_high)
+        self._layouts = {}
+        for char, layout in LAYOUTS.items():
+            self._layouts[char] = self._layouts[char.lower()] = _mask(layout)
+        self._frame = (0,)*len(digit_pins)
+        self.slot_ns = 1e9/(refresh*len(digit_pins))
+        self._clock = clock
+        self._sched = BeatScheduler(self.slot_ns/1e9, spin=spin, clock=clock, sleep=sleep)
+        self._stop = threading.Event()
+        self._reset_stats()
+        self._thread = threading.Thread(target=self._refresh)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _reset_stats(self):
+        self._slots = 0
+        self._missed = 0
+        self._late_sum = 0
+        self._late_sq = 0
+        self._late_max = 0
+        self._stats_start = self._clock()
+
+    def show(self, text):
+        """
+        Show text, one character per digit. Shorter text is padded with
+        blanks on the right.
+        """
+        text = str(text)
+        if len(text) > len(self._frame):
+            raise ValueError('only %d characters can be displayed' % len(self._frame))
+        text = text.ljust(len(self._frame))
+        frame = []
+        for char in text:
+            if char not in self._layouts:
+                raise ValueError('there is no layout for character - %s' % char)
+            frame.append(self._layouts[char])
+        # one assignment, so the refresh thread never sees half a frame
+        self._frame = tuple(frame)
+
+    def _refresh(self):
+        segments = self.segments
+        digits = self.digits
+        count = len(digits)
+        lit = 0
+        mask = 0
+        start = self._clock()
+        i = 0
+        while not self._stop.is_set():
+            late = self._sched.sleep_until(start+int(round(i*self.slot_ns)))
+            if late > self.slot_ns:
+                # fell behind, carry on from the current slot
+                skip = int(late//self.slot_ns)
+                self._missed += skip
+                i += skip
+                late -= skip*self.slot_ns
+            digit = i % count
+            new = self._frame[digit]
+            digits[lit].off()
+            for led in _CHANGED[new ^ mask]:
+                segments[led].value = (new >> led) & 1
+            mask = new
+            digits[digit].on()
+            lit = digit
+            i += 1
+            self._slots += 1
+            self._late_sum += late
+            self._late_sq += late*late
+            if late > self._late_max:
+                self._late_max = late
+        digits[lit].off()
+
+    def stats(self, reset=False):
+        """
+        Return refresh timing since the start (or the last reset): the
+        achieved refresh rate of the whole display, the mean and worst
+        lateness of a digit slot and its standard deviation (jitter), all
+        in milliseconds, and the number of slots missed entirely.
+        """
+        slots = self._slots
+        seconds = (self._clock()-self._stats_start)/1e9
+        mean = self._late_sum/slots if slots else 0.0
+        var = self._late_sq/slots-mean*mean if slots else 0.0
+        result = {
+            'refresh_hz': slots/len(self._frame)/seconds if seconds > 0 else 0.0,
+            'mean_late_ms': mean/1e6,
+            'max_late_ms': self._late_max/1e6,
+            'jitter_ms': math.sqrt(max(var, 0.0))/1e6,
+            'missed': self._missed,
+        }
+        if reset:
+            self._reset_stats()
+        return result
+
+    def close(self):
+        """
+        Stop refreshing, blank the digits and release the pins.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.digits.close()
+        self.segments.close()
@@ -0,0 +1,68 @@
+import os
+import time
+
+# How long a script takes to get going, from the interpreter starting to the
+# first reading. Import this before anything heavy so the clock starts as
+# early as possible; the scripts mark each step as it finishes and can print
+# the lot with --startup.
+
+def process_start_ns(clock=time.perf_counter_ns):
+    """
+    Return when this process started on clock, or None where that isn't
+    known. Linux only counts process start times in clock ticks, so this
+    is good to about 10 ms.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # the command name is in brackets and may hold spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19])/float(os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    return clock()-int((uptime-started)*1e9)
+
+
+class StartupTimer(object):
+    """
+    Times the steps of starting up. :attr:`marks` holds (step, clock ns)
+    in the order the steps finished; the first step, 'interpreter', ends
+    when this module was imported.
+
+    :param clock:
+        Function returning the time in integer nanoseconds.
+    """
+    def __init__(self, clock=time.perf_counter_ns):
+        self._clock = clock
+        now = clock()
+        started = process_start_ns(clock)
+        self.start_ns = now if started is None or started > now else started
+        self.marks = [('interpreter', now)]
+        # called with the step's name after every mark
+        self.on_mark = None
+
+    def mark(self, step):
+        """
+        Record that step has just finished.
+        """
+        self.marks.append((step, self._clock()))
+        if self.on_mark is not None:
+            self.on_mark(step)
+
+    def report(self):
+        """
+        Return a list of (step, ms from process start, ms the step took).
+        """
+        out = []
+        last = self.start_ns
+        for step, ns in self.marks:
+            out.append((step, (ns-self.start_ns)/1e6, (ns-last)/1e6))
+            last = ns
+        return out
+
+    def format(self):
+        return '\n'.join('%-16s %8.1f ms  (+%.1f ms)' % row for row in self.report())
+
+# the timer for this process, started at first import
+timer = StartupTimer()
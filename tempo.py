@@ -0,0 +1,290 @@
+import time
+import numpy as np
+from audio_source import RingBuffer
+from analyzer import rfft_out
+
+# Beat tracking from the microphone, so the conductor follows the ensemble
+# instead of a BPM typed in at the start. Every hop of audio goes through a
+# spectral flux onset detector; a couple of times a second the tempo is
+# re-estimated from the autocorrelation of the recent onset envelope. Both
+# feed a BeatScheduler: the tempo sets its interval and each onset close to
+# a scheduled beat pulls the beats into phase with it.
+
+class OnsetDetector(object):
+    """
+    Spectral flux onset detector. :meth:`process` takes one hop of samples
+    at a time and does not allocate on NumPy 2.x.
+
+    :param int frame:
+        Samples per FFT frame.
+
+    :param int hop:
+        Samples per hop, 256 at 44.1 kHz is under 6 ms.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param float history:
+        Seconds of onset envelope kept for tempo estimation.
+
+    :param float threshold:
+        An onset is flux above threshold times its recent average.
+
+    :param float min_gap:
+        Seconds after an onset before another can be reported.
+    """
+    def __init__(self, frame=1024, hop=256, samp_rate=44100, history=6.0, threshold=2.0, min_gap=0.1):
+        self.frame = frame
+        self.hop = hop
+        self.samp_rate = samp_rate
+        self.hop_rate = samp_rate/float(hop)
+        self.threshold = threshold
+        self._min_gap = int(min_gap*self.hop_rate)
+        # average flux over roughly the last quarter second
+        self._decay = np.exp(-1.0/(0.25*self.hop_rate))
+        self._average = 0.0
+        self._since = self._min_gap
+        # small absolute floor so the noise in a silent room is never an onset
+        self._floor = 1e-3*frame
+
+        self._window = np.hanning(frame)/32768.0
+        self._samples = RingBuffer(frame)
+        self._frame16 = np.zeros(frame, dtype=np.int16)
+        self._frame = np.empty(frame, dtype=float)
+        self._spec = np.empty(frame//2+1, dtype=complex)
+        self._mag = np.zeros(frame//2+1, dtype=float)
+        self._prev = np.zeros(frame//2+1, dtype=float)
+        self._one = np.empty(1, dtype=float)
+        self._rfft_out = rfft_out()
+        self.envelope = RingBuffer(int(history*self.hop_rate), dtype=float)
+
+    def process(self, data):
+        """
+        Feed one hop of int16 samples (bytes or an array). Returns
+        (flux, onset) where onset is ``True`` if this hop starts a note.
+        """
+        self._samples.write(np.frombuffer(data, dtype=np.int16))
+        self._samples.latest(self._frame16)
+        np.multiply(self._frame16, self._window, out=self._frame)
+        if self._rfft_out:
+            np.fft.rfft(self._frame, out=self._spec)
+        else:
+            self._spec[:] = np.fft.rfft(self._frame)
+        # log compressed magnitudes, then the summed rise since last hop
+        mag = self._mag
+        np.abs(self._spec, out=mag)
+        np.log1p(mag, out=mag)
+        prev = self._prev
+        np.subtract(mag, prev, out=prev)
+        np.maximum(prev, 0.0, out=prev)
+        flux = float(np.sum(prev))
+        self._mag, self._prev = prev, mag
+
+        self._one[0] = flux
+        self.envelope.write(self._one)
+
+        self._since += 1
+        onset = (flux > self.threshold*self._average+self._floor
+                 and self._since >= self._min_gap)
+        if onset:
+            self._since = 0
+        self._average = self._decay*self._average+(1-self._decay)*flux
+        return flux, onset
+
+
+class TempoEstimator(object):
+    """
+    Estimates the tempo from an onset envelope by autocorrelation, weighted
+    towards 120 BPM so the half and double tempo lose ties.
+
+    :param float hop_rate:
+        Onset envelope samples per second.
+
+    :param int length:
+        Samples of envelope per estimate.
+
+    :param float min_bpm:
+        Slowest tempo considered.
+
+    :param float max_bpm:
+        Fastest tempo considered.
+    """
+    def __init__(self, hop_rate, length, min_bpm=40, max_bpm=240):
+        self.hop_rate = hop_rate
+        self.length = length
+        self._nfft = 1 << int(np.ceil(np.log2(2*length)))
+        self.lag_min = max(1, int(np.floor(60*hop_rate/max_bpm)))
+        self.lag_max = min(length-2, int(np.ceil(60*hop_rate/min_bpm)))
+        lags = np.arange(self.lag_min, self.lag_max+1)
+        bpm = 60*hop_rate/lags
+        self._prior = np.exp(-0.5*np.log2(bpm/120.0)**2)
+        self._envelope = np.empty(length, dtype=float)
+
+    def estimate(self, envelope):
+        """
+        Return the tempo in BPM of envelope, or None if it has no pulse.
+        """
+        x = self._envelope
+        np.subtract(envelope, np.mean(envelope), out=x)
+        spec = np.fft.rfft(x, self._nfft)
+        acf = np.fft.irfft(spec.real**2+spec.imag**2, self._nfft)
+        if acf[0] <= 0:
+            return None
+        score = acf[self.lag_min:self.lag_max+1]*self._prior
+        k = int(np.argmax(score))
+        if score[k] <= 0:
+            return None
+        offset = 0.0
+        if 0 < k < len(score)-1:
+            denom = score[k-1]-2*score[k]+score[k+1]
+            if denom < 0:
+                offset = 0.5*(score[k-1]-score[k+1])/denom
+        return float(60*self.hop_rate/(self.lag_min+k+offset))
+
+
+class BeatTracker(object):
+    """
+    Feeds live audio into a :class:`scheduler.BeatScheduler`, setting its
+    tempo from the estimated BPM and nudging its phase towards each onset
+    that lands near a scheduled beat.
+
+    :param BeatScheduler scheduler:
+        The scheduler the conductor is waiting on.
+
+    :param int samp_rate:
+        Sampling rate in Hz.
+
+    :param int hop:
+        Samples per hop.
+
+    :param float update:
+        Seconds between tempo estimates.
+
+    :param float correction:
+        Fraction of each onset's phase error corrected at once.
+
+    :param on_onset:
+        Optional function called with the onset time (in clock
+        nanoseconds) as soon as an onset is detected.
+    """
+    def __init__(self, scheduler, samp_rate=44100, hop=256, frame=1024, update=0.5,
+                 correction=0.5, on_onset=None, clock=time.perf_counter_ns):
+        self.scheduler = scheduler
+        self.onsets = OnsetDetector(frame, hop, samp_rate)
+        self.tempo = TempoEstimator(self.onsets.hop_rate, len(self.onsets.envelope))
+        self.correction = correction
+        self.on_onset = on_onset
+        self.bpm = None
+        self._clock = clock
+        self._update = max(1, int(update*self.onsets.hop_rate))
+        self._hops = 0
+        self._envelope = np.empty(len(self.onsets.envelope), dtype=float)
+        # half a hop, the average delay from a sound to the end of its hop
+        self._half_hop_ns = int(0.5e9*hop/samp_rate)
+        self.hop_ns = int(1e9*hop/samp_rate)
+        self.max_process_ns = 0
+
+    def process(self, data, now_ns=None):
+        """
+        Feed one hop of samples that finished arriving at clock time now_ns
+        (default: now). Returns ``True`` if it held an onset.
+        """
+        if now_ns is None:
+            now_ns = self._clock()
+        flux, onset = self.onsets.process(data)
+        self._hops += 1
+        sched = self.scheduler
+
+        if self._hops % self._update == 0 and self.onsets.envelope.count >= len(self._envelope):
+            bpm = self.tempo.estimate(self.onsets.envelope.latest(self._envelope))
+            if bpm is not None:
+                self.bpm = bpm
+                sched.set_interval(60.0/bpm)
+
+        if onset:
+            onset_ns = now_ns-self._half_hop_ns
+            if self.on_onset is not None:
+                self.on_onset(onset_ns)
+            # start and interval as one pair, the conductor thread reads
+            # the same pair while we change it
+            start_ns, interval = sched.timing
+            if start_ns is not None and self.bpm is not None:
+                phase = (onset_ns-start_ns) % interval
+                error = phase if phase < interval/2 else phase-interval
+                # only onsets near a beat say anything about its phase
+                if abs(error) < interval/4:
+                    sched.shift(self.correction*error)
+
+        elapsed = self._clock()-now_ns
+        if elapsed > self.max_process_ns:
+            self.max_process_ns = elapsed
+        return onset
+
+    def report(self):
+        """
+        Return the current tempo and the worst case from a sound arriving to
+        the scheduler being updated: one hop of buffering plus processing.
+        """
+        return {
+            'bpm': self.bpm,
+            'max_process_ms': self.max_process_ns/1e6,
+            'max_latency_ms': (self.hop_ns+self.max_process_ns)/1e6,
+        }
+
+if __name__ == "__main__":
+    import argparse
+    import threading
+    import hardware
+    from audio_source import WavSource, ClickSource
+    from gestures import GESTURES, conduct
+    from scheduler import BeatScheduler
+
+    parser = argparse.ArgumentParser(description="Conduct along with the beat heard by the microphone")
+    parser.add_argument("time_sig", choices=list(GESTURES))
+    parser.add_argument("--wav", help="follow a WAV file instead of the microphone")
+    parser.add_argument("--click", type=float, help="follow a synthetic click track at this BPM")
+    parser.add_argument("--bpm", type=float, default=120, help="tempo until the first estimate")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long")
+    parser.add_argument("--mock", action="store_true",
+                        help="simulated pins and microphone, no Pi needed, see hardware.py")
+    args = parser.parse_args()
+
+    hardware.use('sim' if args.mock else None)
+
+    hop = 256
+    live = not (args.wav or args.click)
+    if args.wav:
+        source = WavSource(args.wav)
+    elif args.click:
+        source = ClickSource(args.click, duration=args.seconds)
+    else:
+        source = hardware.audio_input(2, 44100, hop)
+
+    myServo,myServo1,myServo2=hardware.servos()
+
+    scheduler = BeatScheduler(60.0/args.bpm)
+    tracker = BeatTracker(scheduler, source.samp_rate, hop)
+    arm = threading.Thread(target=conduct, args=(GESTURES[args.time_sig], None, scheduler.interval_ns/1e9,
+                                                 (myServo,myServo1,myServo2), scheduler))
+    arm.daemon = True
+    arm.start()
+
+    start = time.perf_counter_ns()
+    hops = 0
+    try:
+        while args.seconds is None or hops*tracker.hop_ns < args.seconds*1e9:
+            data = source.read(hop)
+            if len(data) < 2*hop:
+                break
+            hops += 1
+            if not live:
+                # play files and click tracks back in real time
+                scheduler.sleep_until(start+hops*tracker.hop_ns)
+            if tracker.process(data):
+                print('onset, tempo %s BPM' % ('?' if tracker.bpm is None else '%.1f' % tracker.bpm))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+    print('tempo %(bpm)s BPM, worst hop processing %(max_process_ms).2f ms, '
+          'worst sound to scheduler %(max_latency_ms).2f ms' % tracker.report())
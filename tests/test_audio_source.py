@@ -0,0 +1,69 @@
+import threading
+import time
+import numpy as np
+from audio_source import FrameRing, RingBuffer
+
+def block(value, size=8):
+    return np.full(size, value, dtype=np.int16)
+
+def test_frame_ring_keeps_order_and_stamps():
+    ring = FrameRing(4, 8)
+    out = np.zeros(8, dtype=np.int16)
+    for n in range(3):
+        assert ring.push(block(n).tobytes(), stamp=1000+n)
+    assert len(ring) == 3
+    for n in range(3):
+        assert ring.get(out)
+        assert np.all(out == n)
+        assert ring.stamp == 1000+n
+    assert len(ring) == 0
+    assert ring.high_water == 3
+
+def test_frame_ring_counts_overflows():
+    ring = FrameRing(4, 8)
+    out = np.zeros(8, dtype=np.int16)
+    results = [ring.push(block(n), stamp=n) for n in range(6)]
+    # a full ring drops the new block, never one already queued
+    assert results == [True]*4+[False]*2
+    assert ring.overflows == 2
+    assert ring.high_water == 4
+    got = []
+    while ring.get(out, timeout=0):
+        got.append(ring.stamp)
+    assert got == [0, 1, 2, 3]
+
+def test_frame_ring_get_times_out():
+    ring = FrameRing(4, 8)
+    start = time.perf_counter()
+    assert not ring.get(np.zeros(8, dtype=np.int16), timeout=0.05)
+    assert time.perf_counter()-start >= 0.04
+
+def test_frame_ring_between_threads():
+    # every block arrives once and in order while the producer never waits
+    ring = FrameRing(16, 8)
+    count = 2000
+    got = []
+    def consume():
+        out = np.zeros(8, dtype=np.int16)
+        while len(got) < count:
+            if ring.get(out, timeout=1.0):
+                assert np.all(out == ring.stamp % 30000)
+                got.append(ring.stamp)
+    thread = threading.Thread(target=consume)
+    thread.start()
+    n = 0
+    while n < count:
+        if ring.push(block(n % 30000), stamp=n):
+            n += 1
+        else:
+            time.sleep(0.0001)
+    thread.join(5.0)
+    assert got == list(range(count))
+    assert ring.high_water <= ring.slots
+
+def test_ring_buffer_keeps_latest():
+    ring = RingBuffer(5)
+    ring.write(np.arange(3, dtype=np.int16))
+    ring.write(np.arange(3, 7, dtype=np.int16))
+    assert ring.count == 7
+    assert list(ring.latest(np.zeros(5, dtype=np.int16))) == [2, 3, 4, 5, 6]
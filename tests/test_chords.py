@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from audio_source import SineSource, MixSource
+from chords import MultiPitchDetector
+
+def chord(*freqs, chunk=4096):
+    source = MixSource(*[SineSource(f, amplitude=0.8/len(freqs), harmonics=(1, 0.5, 0.3, 0.2))
+                         for f in freqs])
+    return np.frombuffer(source.read(chunk), dtype=np.int16)
+
+def test_finds_every_note_of_a_triad():
+    detector = MultiPitchDetector(max_notes=4)
+    freqs, scores, notes, cents = detector.detect(chord(261.63, 329.63, 392.0))
+    assert sorted(detector.names(notes)) == ['C4', 'E4', 'G4']
+    used = notes >= 0
+    assert np.sort(freqs[used]) == pytest.approx([261.63, 329.63, 392.0], rel=5e-3)
+    assert np.all(np.abs(cents[used]) < 10)
+
+def test_batch_matches_single_frames():
+    detector = MultiPitchDetector()
+    frames = np.stack([chord(261.63, 329.63, 392.0), chord(220.0, 277.18)])
+    batch = detector.detect_many(frames)
+    for row, frame in enumerate(frames):
+        single = detector.detect(frame)
+        assert np.array_equal(batch[2][row], single[2])
+
+@pytest.mark.parametrize('fmin', [20, 50, 60])
+def test_low_fmin(fmin):
+    detector = MultiPitchDetector(fmin=fmin)
+    freqs, scores, notes, cents = detector.detect(chord(82.41, 110.0))
+    assert sorted(detector.names(notes)) == ['A2', 'E2']
+
+def test_silence_has_no_notes():
+    freqs, scores, notes, cents = MultiPitchDetector().detect(np.zeros(4096, dtype=np.int16))
+    assert np.all(notes == -1)
+    assert np.all(np.isnan(freqs))
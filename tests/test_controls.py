@@ -0,0 +1,31 @@
+import pytest
+from controls import TapTempo
+
+S = 1000000000
+
+def taps(tempo, times):
+    return [tempo.tap(int(t*S)) for t in times]
+
+def test_two_taps_give_a_tempo():
+    tempo = TapTempo()
+    assert taps(tempo, [0.0, 0.5]) == [None, pytest.approx(120.0)]
+
+def test_averages_the_recent_intervals():
+    tempo = TapTempo(taps=4)
+    bpm = taps(tempo, [0.0, 0.5, 1.1, 1.6, 2.2])
+    assert bpm[-1] == pytest.approx(60*4/2.2)
+    # only the last four intervals count
+    assert tempo.tap(int(2.6*S)) == pytest.approx(60*4/(2.6-0.5))
+
+def test_bounce_is_ignored():
+    tempo = TapTempo(min_interval=0.2)
+    bpm = taps(tempo, [0.0, 0.05, 0.5])
+    assert bpm[1] is None
+    # the bounce doesn't move the last tap
+    assert bpm[2] == pytest.approx(120.0)
+
+def test_long_gap_starts_again():
+    tempo = TapTempo(max_interval=2.0)
+    taps(tempo, [0.0, 0.5, 1.0])
+    assert tempo.tap(int(5.0*S)) is None
+    assert tempo.tap(int(6.0*S)) == pytest.approx(60.0)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from audio_source import SineSource
+from detectors import AutocorrDetector, YinDetector, make_detector
+
+def frame(freq, chunk=4096, **kwargs):
+    return np.frombuffer(SineSource(freq, **kwargs).read(chunk), dtype=np.int16)
+
+@pytest.mark.parametrize('name', ['yin', 'acf', 'fft'])
+@pytest.mark.parametrize('freq', [110.0, 261.63, 440.0, 1046.5])
+def test_detectors_find_tones(name, freq):
+    detector = make_detector(name)
+    assert detector.frequency(frame(freq, harmonics=(1, 0.5, 0.3))) == pytest.approx(freq, rel=2e-3)
+
+@pytest.mark.parametrize('detector', [AutocorrDetector, YinDetector])
+def test_fmin_is_in_range(detector):
+    # a tone at exactly fmin has its period on the last lag searched
+    assert detector(fmin=100).frequency(frame(100.0)) == pytest.approx(100.0, rel=1e-3)
+
+def test_batch_matches_single_frames():
+    detector = AutocorrDetector()
+    frames = np.stack([frame(f) for f in (100.0, 220.0, 880.0)])
+    single = [detector.frequency(f) for f in frames]
+    assert np.allclose(detector.frequencies(frames), single)
+
+def test_silence_is_unpitched():
+    assert AutocorrDetector().frequency(np.zeros(4096, dtype=np.int16)) is None
+
+def test_fft_frequency_matches_peak_frequency():
+    analyzer = make_detector('fft')
+    data = frame(440.0, harmonics=(1, 0.5, 0.3))
+    assert analyzer.frequency(data) == analyzer.peak_frequency(data)
+    assert analyzer.confidence > 0.5
+    assert np.allclose(analyzer.frequencies(np.stack([data, data])), analyzer.peak_frequency(data))
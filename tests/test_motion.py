@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import hardware
+from gestures import GESTURES
+from motion import MotionEngine
+
+def fake_clock():
+    # a clock that moves on with every read and jumps over sleeps
+    now = [0]
+    def clock():
+        now[0] += 1000
+        return now[0]
+    def sleep(seconds):
+        now[0] += int(seconds*1e9)
+    return clock, sleep
+
+@pytest.mark.parametrize('name', sorted(GESTURES))
+@pytest.mark.parametrize('easing', ['step', 'linear', 'cubic', 'minjerk'])
+def test_positions_hit_keyframes(name, easing):
+    gesture = GESTURES[name]
+    engine = MotionEngine(hardware.virtual_servos('motion'), easing=easing)
+    beats = np.concatenate([gesture.offsets, gesture.offsets+gesture.beats])
+    expected = np.vstack([gesture.targets, gesture.targets])
+    assert np.allclose(engine.positions(gesture, beats), expected)
+
+def test_positions_between_keyframes():
+    gesture = GESTURES['3/4']
+    halfway = np.array([0.5, 1.5, 2.5])
+    ahead = np.roll(gesture.targets, -1, axis=0)
+    step = MotionEngine(hardware.virtual_servos('motion'), easing='step')
+    assert np.allclose(step.positions(gesture, halfway), gesture.targets)
+    for easing in ('linear', 'cubic', 'minjerk'):
+        engine = MotionEngine(hardware.virtual_servos('motion'), easing=easing)
+        # every curve is symmetric, so half way in time is half way there
+        assert np.allclose(engine.positions(gesture, halfway), (gesture.targets+ahead)/2, atol=1e-3)
+
+def test_play_writes_keyframes_on_their_ticks():
+    gesture = GESTURES['4/4']
+    clock, sleep = fake_clock()
+    servos = hardware.virtual_servos('motion')
+    engine = MotionEngine(servos, rate=100, clock=clock, sleep=sleep)
+    hardware.pin_log.clear()
+    engine.play(gesture, 8, 0.5)
+    # 50 ticks a beat up to the last keyframe on beat 7, then the last keyframe again
+    assert engine.report()['ticks'] == 351
+    assert engine.report()['skipped'] == 0
+    for j, servo in enumerate(servos):
+        values = hardware.pin_log.arrays(servo.name)[1]
+        assert len(values) == 352
+        for beat in range(8):
+            assert values[50*beat] == pytest.approx(gesture.targets[beat % 4, j])
+        assert values[-1] == gesture.targets[3, j]
+
+def test_late_ticks_are_skipped():
+    gesture = GESTURES['2/4']
+    clock, sleep = fake_clock()
+    def slow(seconds):
+        # every sleep overshoots by three ticks
+        sleep(seconds+0.03)
+    engine = MotionEngine(hardware.virtual_servos('motion'), rate=100, clock=clock, sleep=slow)
+    engine.play(gesture, 2, 0.5)
+    report = engine.report()
+    assert report['skipped'] > 0
+    assert report['max_overrun_ms'] > 10
@@ -0,0 +1,65 @@
+import socket
+import threading
+import time
+import numpy as np
+import hardware
+from netsync import ClockSync, Leader, Follower, skew
+
+def test_clock_sync_finds_offset_and_drift():
+    sync = ClockSync()
+    offset, drift = 25e6, 80e-6
+    rng = np.random.default_rng(1)
+    for n in range(32):
+        t1 = int(n*0.5e9)
+        delay = int(rng.uniform(50e3, 400e3))
+        remote = t1+delay//2
+        t2 = int(remote+offset+drift*remote)
+        t3 = t2+10000
+        t4 = t1+delay+10000
+        sync.add(t1, t2, t3, t4)
+    now = int(16e9)
+    assert abs(sync.offset_at(now)-(offset+drift*now)) < 0.2e6
+    assert abs(sync.drift-drift) < 20e-6
+
+def test_announce_from_several_threads():
+    leader = Leader(hardware.virtual_servos('leader'), address=('127.0.0.1', 0))
+    errors = []
+    stop = threading.Event()
+    def churn():
+        # followers coming and going while the schedule is announced
+        n = 0
+        while not stop.is_set():
+            n += 1
+            with leader._lock:
+                leader.followers[('127.0.0.1', 40000+n % 500)] = time.monotonic()-20*(n % 2)
+    def announce():
+        try:
+            while not stop.is_set():
+                leader._announce()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=churn)]+[threading.Thread(target=announce) for _ in range(2)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+    stop.set()
+    for t in threads:
+        t.join()
+    leader._sock.close()
+    assert not errors
+
+def test_follower_keeps_time_with_leader():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    leader = Leader(hardware.virtual_servos('leader'), '2/4', 240, ('127.0.0.1', port), lead_in=0.5)
+    follower = Follower(hardware.virtual_servos('follower'), ('127.0.0.1', port))
+    leader.start()
+    follower.start()
+    time.sleep(3)
+    follower.stop()
+    leader.stop()
+    spread = skew([leader.written, follower.written])
+    assert len(spread) >= 4
+    assert np.median(spread) < 2.0
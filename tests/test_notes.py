@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from notes import NoteTable, TEMPERAMENTS, load_table
+
+@pytest.mark.parametrize('temperament', sorted(TEMPERAMENTS))
+def test_a4_is_exact(temperament):
+    table = NoteTable(a4=442.0, temperament=temperament)
+    assert table.nearest(442.0)[:2] == ('A', 4)
+    assert table.nearest(442.0)[2] == pytest.approx(0.0, abs=1e-6)
+
+def test_equal_temperament():
+    table = NoteTable()
+    name, octave, cents = table.nearest(261.6256)
+    assert (name, octave) == ('C', 4)
+    assert abs(cents) < 0.01
+    assert table.nearest(0.0) is None
+
+def test_load_table_is_shared():
+    table = load_table(415.0, 'vallotti', 'D')
+    assert load_table(415.0, 'vallotti', 'D') is table
+    assert load_table(415.0, 'vallotti', 'C') is not table
+    assert np.allclose(table.freqs, NoteTable(415.0, temperament='vallotti', root='D').freqs)
@@ -0,0 +1,25 @@
+import csv
+import wave
+import numpy as np
+from audio_source import SineSource
+from notes import NoteTable
+from offline import analyse_file, write_csv
+
+def test_tone_then_silence_to_csv(tmp_path):
+    wav = str(tmp_path/'a4.wav')
+    tone = SineSource(440.0).read(44100)
+    with wave.open(wav, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(44100)
+        f.writeframes(tone+bytes(2*44100))
+    duration, result = analyse_file(wav, gate_dbfs=-50.0)
+    assert duration == 2.0
+    out = str(tmp_path/'a4.csv')
+    write_csv(out, result, NoteTable())
+    with open(out) as f:
+        rows = list(csv.DictReader(f))
+    notes = [(r['note'], r['octave']) for r in rows]
+    assert ('A', '4') in notes
+    assert ('', '') in notes
+    assert set(notes) == {('A', '4'), ('', '')}
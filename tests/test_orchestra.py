@@ -0,0 +1,52 @@
+import time
+import asyncio
+import numpy as np
+import hardware
+from latency import servo_log
+from orchestra import Orchestra, Arm
+
+class Ticker(object):
+    # a device due every period from offset, logging how late it ran
+    def __init__(self, offset_ms, period_ms=10.0, count=40):
+        self.name = 'ticker%g' % offset_ms
+        self.offset_ns = int(offset_ms*1e6)
+        self.period_ns = int(period_ms*1e6)
+        self.count = count
+        self.log = servo_log()
+
+    async def run(self, orchestra):
+        for n in range(self.count):
+            due = orchestra.start_ns+self.offset_ns+n*self.period_ns
+            late = await orchestra.sleep_until(due)
+            self.log.record(due, due+late, self.log.now())
+
+class Worker(Ticker):
+    # hands 0.5 ms of work to a thread on every deadline, like a tuner
+    async def run(self, orchestra):
+        loop = asyncio.get_running_loop()
+        for n in range(self.count):
+            due = orchestra.start_ns+self.offset_ns+n*self.period_ns
+            late = await orchestra.sleep_until(due)
+            await loop.run_in_executor(None, time.sleep, 0.0005)
+            self.log.record(due, due+late, self.log.now())
+
+def test_waiting_device_does_not_hold_up_others():
+    # the ticker polls for its deadline while the worker's thread finishes;
+    # the worker must get its result straight away, not when the ticker is
+    # done
+    orchestra = Orchestra()
+    worker = orchestra.add(Worker(0.0))
+    ticker = orchestra.add(Ticker(2.0))
+    orchestra.run()
+    assert np.median(worker.log.intervals('scheduled', 'written')) < 1.5
+    assert np.median(ticker.log.intervals('scheduled', 'woke')) < 0.5
+
+def test_arms_in_lockstep():
+    hardware.use('sim')
+    orchestra = Orchestra()
+    arms = [orchestra.add(Arm('arm%d' % i, hardware.virtual_servos('arm%d' % i), '3/4', 240, num_beats=6))
+            for i in range(4)]
+    orchestra.run()
+    written = np.stack([arm.log.records()[:, 2] for arm in arms])
+    assert written.shape == (4, 6)
+    assert np.median(written.max(axis=0)-written.min(axis=0)) < 2e6
@@ -0,0 +1,45 @@
+import numpy as np
+from audio_source import SineSource
+from pipeline import TunerPipeline
+
+def test_every_hop_is_analysed():
+    shown = []
+    tuner = TunerPipeline(SineSource(440.0, duration=1.0), shown.append, realtime=False)
+    tuner.start()
+    tuner.wait()
+    tuner.stop()
+    stats = tuner.stats()
+    assert stats['captured'] == 44100//1024
+    # the first window needs chunk/hop hops before it can be analysed
+    assert stats['analysed'] == stats['captured']-(4096//1024-1)
+    assert stats['overflows'] == 0
+    assert [found[0] for found in shown if found is not None] == ['A']
+    assert stats['updates'] == len(shown)
+
+def test_hops_are_stamped_through_to_output():
+    shown = []
+    tuner = TunerPipeline(SineSource(440.0, duration=0.5), shown.append)
+    tuner.start()
+    tuner.wait()
+    tuner.stop()
+    capture, start, end, match = tuner.latency['analysis'].records().T
+    assert len(capture) == tuner.stats()['analysed']
+    assert np.all(capture > 0)
+    assert np.all(start >= capture)
+    assert np.all(np.diff(capture) > 0)
+    output = tuner.latency['output'].records()
+    assert len(output) == tuner.stats()['updates']
+    assert np.all(output[:, 4] >= output[:, 3])
+
+def test_dropped_hops_are_counted():
+    # nothing is taking hops off the ring, so once it is full every hop
+    # pushed is dropped and counted
+    tuner = TunerPipeline(SineSource(440.0), lambda found: None, slots=8)
+    source = SineSource(440.0)
+    for n in range(20):
+        tuner._push(source.read(1024))
+    stats = tuner.stats()
+    assert stats['captured'] == 20
+    assert stats['overflows'] == 12
+    assert stats['high_water'] == 8
+    assert len(tuner.ring) == 8
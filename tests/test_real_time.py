@@ -0,0 +1,17 @@
+import numpy as np
+from audio_source import SineSource
+from latency import tuner_logs
+import real_time
+
+def test_run_stamps_capture_before_analysis():
+    shown = []
+    logs = tuner_logs()
+    real_time.run(SineSource(440.0, duration=0.5), shown.append, latency=logs)
+    assert shown == ['A']
+    records = logs['analysis'].records()
+    assert len(records) > 10
+    capture, start, end, match = records.T
+    # each hop is stamped as its read returns, before the window is built
+    assert np.all(start > capture)
+    assert np.all(end >= start)
+    assert np.all(match >= end)
@@ -0,0 +1,49 @@
+import threading
+import time
+from scheduler import BeatScheduler
+from controls import LiveConductor
+import hardware
+
+def test_set_interval_keeps_the_last_beat():
+    now = [0]
+    sched = BeatScheduler(0.5, clock=lambda: now[0], sleep=lambda s: None)
+    sched.start()
+    sched.position = 4
+    sched.set_interval(0.25)
+    assert sched.timing == (1000000000, 250000000)
+    assert sched.deadline(4) == 2000000000
+    assert sched.deadline(5) == 2250000000
+
+def test_deadline_never_mixes_start_and_interval():
+    # tempo changes from another thread while deadlines are read: every
+    # deadline must come from one whole (start, interval) pair
+    sched = BeatScheduler(0.5, clock=lambda: 0)
+    sched.start()
+    sched.position = 10
+    allowed = {6000000000, 5500000000}
+    stop = threading.Event()
+    def tap():
+        while not stop.is_set():
+            sched.set_interval(0.25)
+            sched.set_interval(0.5)
+    thread = threading.Thread(target=tap)
+    thread.start()
+    try:
+        end = time.perf_counter()+0.3
+        while time.perf_counter() < end:
+            assert sched.deadline(12) in allowed
+    finally:
+        stop.set()
+        thread.join()
+
+def test_live_conductor_reports_lateness():
+    hardware.use('sim')
+    conductor = LiveConductor(hardware.virtual_servos('live'), '4/4', bpm=600)
+    conductor.start()
+    time.sleep(0.5)
+    conductor.set_tempo(1200)
+    time.sleep(0.2)
+    conductor.stop()
+    report = conductor.scheduler.report()
+    assert report['beats'] >= 4
+    assert report['max_ms'] < 20
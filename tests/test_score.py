@@ -0,0 +1,55 @@
+import struct
+import numpy as np
+import pytest
+from score import Score, gesture_for
+
+DIVISION = 480
+
+def _varlen(n):
+    out = [n & 0x7F]
+    n >>= 7
+    while n:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    return bytes(reversed(out))
+
+def write_midi(path, meters, tempo=500000):
+    # one track of (numerator, denominator, bars) time signatures
+    events = [(0, b'\xff\x51\x03'+tempo.to_bytes(3, 'big'))]
+    delta = 0
+    for num, den, bars in meters:
+        events.append((delta, b'\xff\x58\x04'+bytes([num, den.bit_length()-1, 24, 8])))
+        delta = bars*num*DIVISION*4//den
+    events.append((delta, b'\xff\x2f\x00'))
+    body = b''.join(_varlen(d)+e for d, e in events)
+    with open(path, 'wb') as f:
+        f.write(b'MThd'+struct.pack('>IHHH', 6, 0, 1, DIVISION))
+        f.write(b'MTrk'+struct.pack('>I', len(body))+body)
+
+@pytest.mark.parametrize('meter, name', [
+    ((4, 4), '4/4'), ((6, 8), '6/8'), ((12, 8), '12/8'),
+    ((2, 2), '2/4'), ((9, 8), '3/4'), ((15, 8), '5/4'), ((7, 8), '6/8'),
+])
+def test_gesture_for(meter, name):
+    assert gesture_for(*meter) == name
+
+def test_nine_eight_is_three_dotted_beats(tmp_path):
+    path = str(tmp_path/'nine.mid')
+    write_midi(path, [(9, 8, 2)])
+    score = Score.load(path)
+    assert len(score) == 6
+    assert set(score.names[g] for g in score.gesture_ids.tolist()) == {'3/4'}
+    # a dotted quarter at 120 BPM is 0.75 s
+    assert np.allclose(np.diff(score.times_ns)/1e9, 0.75)
+    assert score.bars[0][2] == '3/4'
+    assert score.bars[0][3] == pytest.approx(80.0)
+
+def test_odd_meter_fills_the_bar(tmp_path):
+    path = str(tmp_path/'seven.mid')
+    write_midi(path, [(4, 4, 1), (7, 8, 1)])
+    score = Score.load(path)
+    names = [score.names[g] for g in score.gesture_ids.tolist()]
+    assert names == ['4/4']*4+['6/8']*6
+    # six beats spread over the 3.5 quarter note bar
+    assert score.ticks[4] == 4*DIVISION
+    assert np.allclose(np.diff(score.ticks[4:]), 3.5*DIVISION/6)
@@ -0,0 +1,120 @@
+import time
+import pytest
+import hardware
+from sevensegment import SevenSegmentDisplay, MultiplexedDisplay, LAYOUTS, display_many, _mask
+
+SEGMENTS = (5, 6, 13, 19, 26, 12, 20)
+NAMES = ['GPIO%d' % pin for pin in SEGMENTS]
+
+def written(pins):
+    # the (pin name, value) writes to pins since the log was cleared
+    return [(p, v) for _, p, v in hardware.pin_log.writes if p in pins]
+
+def test_display_writes_only_changed_segments():
+    hardware.use('sim')
+    seven = SevenSegmentDisplay(*SEGMENTS)
+    try:
+        hardware.pin_log.clear()
+        seven.display('8')
+        assert sorted(written(NAMES)) == sorted((name, 1.0) for name in NAMES)
+        hardware.pin_log.clear()
+        # 8 to 0 only turns off G
+        seven.display('0')
+        assert written(NAMES) == [('GPIO20', 0.0)]
+        hardware.pin_log.clear()
+        seven.display('0')
+        assert written(NAMES) == []
+        # 0 to 7 turns off D, E and F
+        seven.display('7')
+        assert sorted(written(NAMES)) == [('GPIO12', 0.0), ('GPIO19', 0.0), ('GPIO26', 0.0)]
+        assert tuple(bool(led.value) for led in seven) == LAYOUTS['7']
+    finally:
+        seven.close()
+
+def test_display_follows_direct_writes():
+    # segments set through the board are not written again by display
+    hardware.use('sim')
+    seven = SevenSegmentDisplay(*SEGMENTS)
+    try:
+        seven.on()
+        hardware.pin_log.clear()
+        seven.display('8')
+        assert written(NAMES) == []
+        seven.off()
+        hardware.pin_log.clear()
+        seven.display('-')
+        assert written(NAMES) == [('GPIO20', 1.0)]
+    finally:
+        seven.close()
+
+def test_display_many_checks_every_character_first():
+    hardware.use('sim')
+    top = SevenSegmentDisplay(*SEGMENTS)
+    bot = SevenSegmentDisplay(2, 3, 4, 14, 15, 18, 23)
+    try:
+        display_many((top, bot), 'A=')
+        hardware.pin_log.clear()
+        with pytest.raises(ValueError):
+            display_many((top, bot), 'B%')
+        assert len(hardware.pin_log) == 0
+        assert tuple(bool(led.value) for led in top) == LAYOUTS['A']
+    finally:
+        top.close()
+        bot.close()
+
+def replay(writes, digit_names):
+    # walk the pin log, returning the segment mask each digit was lit with
+    # and checking no segment is written with the value it already had
+    segments = [None]*7
+    lit = set()
+    shown = []
+    for t, pin, value in writes:
+        if pin in NAMES:
+            led = NAMES.index(pin)
+            assert segments[led] != value
+            segments[led] = value
+        elif pin in digit_names:
+            if value:
+                lit.add(pin)
+                shown.append((t, digit_names.index(pin), _mask(segments)))
+            else:
+                lit.discard(pin)
+            assert len(lit) <= 1
+    return shown, lit
+
+def test_multiplexed_display_refresh():
+    hardware.use('sim')
+    digit_names = ['GPIO16', 'GPIO21']
+    hardware.pin_log.clear()
+    disp = MultiplexedDisplay(SEGMENTS, (16, 21), refresh=100)
+    try:
+        with pytest.raises(ValueError):
+            disp.show('ABC')
+        disp.show('A#')
+        shown_ns = time.perf_counter_ns()
+        time.sleep(0.5)
+        stats = disp.stats()
+    finally:
+        disp.close()
+    shown, lit = replay(hardware.pin_log.writes, digit_names)
+    # blanked on close
+    assert not lit
+    # the first slot after show may still have the old frame
+    after = [(digit, mask) for t, digit, mask in shown if t > shown_ns][1:]
+    assert len(after) > 20
+    frame = (_mask(LAYOUTS['A']), _mask(LAYOUTS['#']))
+    for digit, mask in after:
+        assert mask == frame[digit]
+    assert set(digit for digit, _ in after) == {0, 1}
+    assert 50 < stats['refresh_hz'] < 110
+    assert stats['max_late_ms'] >= stats['mean_late_ms'] >= 0
+    assert stats['jitter_ms'] >= 0
+
+def test_multiplexed_display_pads_short_text():
+    hardware.use('sim')
+    disp = MultiplexedDisplay(SEGMENTS, (16, 21), refresh=100)
+    try:
+        disp.show('7')
+        assert disp._frame == (_mask(LAYOUTS['7']), 0)
+    finally:
+        disp.close()
@@ -0,0 +1,26 @@
+import numpy as np
+from scheduler import BeatScheduler
+from tempo import BeatTracker
+
+def clicks(bpm, seconds, samp_rate=44100):
+    # short noise bursts on every beat
+    samples = np.zeros(int(seconds*samp_rate))
+    period = int(round(60.0*samp_rate/bpm))
+    rng = np.random.default_rng(0)
+    for start in range(0, len(samples), period):
+        burst = samples[start:start+441]
+        burst[:] = rng.uniform(-20000, 20000, len(burst))
+    return samples.astype(np.int16)
+
+def test_tracker_moves_the_scheduler_to_the_beat():
+    now = [0]
+    sched = BeatScheduler(0.5, clock=lambda: now[0])
+    sched.start()
+    tracker = BeatTracker(sched, hop=256, clock=lambda: now[0])
+    audio = clicks(100, 12)
+    for i in range(len(audio)//256):
+        now[0] = int((i+1)*256*1e9/44100)
+        tracker.process(audio[i*256:(i+1)*256], now[0])
+    assert abs(tracker.bpm-100) < 2
+    start_ns, interval_ns = sched.timing
+    assert abs(interval_ns-0.6e9) < 0.015e9